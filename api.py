@@ -0,0 +1,264 @@
+# --- API HTTP somente leitura dos relatórios do SISAP ---
+#
+# Serve em JSON os mesmos resultados pré-calculados da publicação estática (gerar_relatorios),
+# calculados uma única vez por versão dos dados. Outros sistemas podem consultar a carga
+# patrimonial por unidade, os totais por Conta SIAFI e as listas de discrepâncias sem abrir
+# o app nem reler a planilha.
+#
+# Uso:  python api.py [--host 127.0.0.1] [--porta 8502]
+#
+# Rotas:
+#   GET /api/versao                          versão dos dados e relatórios disponíveis
+#   GET /api/relatorios/<nome>?pagina=1&tamanho=100
+#   GET /api/validacao                       resumo da validação da carga (sem a lista de linhas)
+#   GET /api/cubo?dimensoes=Campus,Conta SIAFI  totais consolidados a partir do cubo de agregados
+#
+# As respostas têm ETag baseado na versão dos dados e, no cubo, também no arquivo de hierarquia
+# (If-None-Match devolve 304), e são comprimidas com gzip quando o cliente envia Accept-Encoding: gzip.
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import espelhamento as esp
+
+TAMANHO_PAGINA_PADRAO = 100
+TAMANHO_PAGINA_MAXIMO = 1000
+TAMANHO_MINIMO_GZIP = 1024 # respostas menores não compensam a compressão
+MAXIMO_RESPOSTAS_EM_CACHE = 256
+
+# ============================
+# Resultados pré-calculados por versão dos dados
+# ============================
+_lock_relatorios = threading.Lock()
+_relatorios = {"versao": None, "dados": None}
+_lock_respostas = threading.Lock()
+_respostas = OrderedDict()
+
+class ErroApi(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+def obter_relatorios():
+    versao = esp.versao_dados()
+    # Um único cálculo por versão, mesmo com várias requisições simultâneas
+    with _lock_relatorios:
+        if _relatorios["versao"] != versao:
+            data = esp.carregar_base()
+            if data is None:
+                raise ErroApi(503, f"Não foi possível carregar os dados de '{esp.ARQUIVO_DADOS}'.")
+            _relatorios["dados"] = esp.gerar_relatorios(data)
+            # Versão da base efetivamente carregada (load_data é indexado pela versão dos dados)
+            _relatorios["versao"] = data.attrs.get("versao", versao)
+        return _relatorios["versao"], _relatorios["dados"]
+
+def ler_inteiro(parametros, nome, padrao, minimo, maximo):
+    valor = parametros.get(nome, [str(padrao)])[-1]
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ErroApi(400, f"Parâmetro '{nome}' deve ser um número inteiro.")
+    if not minimo <= valor <= maximo:
+        raise ErroApi(400, f"Parâmetro '{nome}' deve estar entre {minimo} e {maximo}.")
+    return valor
+
+# ============================
+# Rotas
+# ============================
+def rota_versao(versao, relatorios, parametros):
+    return {"versao": versao, "relatorios": sorted(relatorios)}
+
+def rota_relatorio(versao, relatorios, parametros, nome):
+    if nome not in relatorios:
+        raise ErroApi(404, f"Relatório '{nome}' não encontrado. Disponíveis: {', '.join(sorted(relatorios))}.")
+    df = relatorios[nome]
+    tamanho = ler_inteiro(parametros, "tamanho", TAMANHO_PAGINA_PADRAO, 1, TAMANHO_PAGINA_MAXIMO)
+    total_paginas = max(1, -(-len(df) // tamanho))
+    pagina = ler_inteiro(parametros, "pagina", 1, 1, total_paginas)
+    inicio = (pagina - 1) * tamanho
+    dados = json.loads(df.iloc[inicio:inicio + tamanho].to_json(orient="records", date_format="iso", force_ascii=False))
+    return {
+        "versao": versao,
+        "relatorio": nome,
+        "pagina": pagina,
+        "tamanho": tamanho,
+        "total_registros": len(df),
+        "total_paginas": total_paginas,
+        "dados": dados,
+    }
+
+def rota_validacao(versao, relatorios, parametros):
+    validacao = esp.carregar_validacao()
+    if validacao is None:
+        raise ErroApi(404, "Relatório de validação indisponível para a versão atual dos dados.")
+    return {
+        "versao": versao,
+        "total_registros": validacao["total_registros"],
+        "esquema": validacao["esquema"],
+        "verificacoes": {
+            nome: {chave: valor for chave, valor in verificacao.items() if chave != "linhas"}
+            for nome, verificacao in validacao["verificacoes"].items()
+        },
+    }
+
+def rota_cubo(versao, relatorios, parametros):
+    # O cubo fica gravado ao lado do snapshot; o lock evita que seja montado duas vezes
+    with _lock_relatorios:
+        data = esp.carregar_base()
+        if data is None:
+            raise ErroApi(503, f"Não foi possível carregar os dados de '{esp.ARQUIVO_DADOS}'.")
+        cubo, niveis = esp.calcular_cubo(data)
+    disponiveis = niveis + esp.DIMENSOES_CUBO
+    dimensoes = [d.strip() for d in parametros.get("dimensoes", [""])[-1].split(",") if d.strip()]
+    invalidas = [d for d in dimensoes if d not in disponiveis]
+    if invalidas:
+        raise ErroApi(400, f"Dimensões inválidas: {', '.join(invalidas)}. Disponíveis: {', '.join(disponiveis)}.")
+    df = esp.consolidar_cubo(cubo, dimensoes)
+    return {
+        "versao": versao,
+        "dimensoes": dimensoes,
+        "dimensoes_disponiveis": disponiveis,
+        "dados": json.loads(df.to_json(orient="records", force_ascii=False)),
+    }
+
+def resolver(caminho, parametros):
+    versao, relatorios = obter_relatorios()
+    partes = partes_caminho(caminho)
+    if partes == ["api", "versao"]:
+        return versao, rota_versao(versao, relatorios, parametros)
+    if partes == ["api", "validacao"]:
+        return versao, rota_validacao(versao, relatorios, parametros)
+    if partes == ["api", "cubo"]:
+        return versao, rota_cubo(versao, relatorios, parametros)
+    if len(partes) == 3 and partes[:2] == ["api", "relatorios"]:
+        return versao, rota_relatorio(versao, relatorios, parametros, partes[2])
+    raise ErroApi(404, f"Rota '{caminho}' não encontrada.")
+
+def partes_caminho(caminho):
+    return [parte for parte in caminho.split("/") if parte]
+
+def calcular_etag(caminho, consulta):
+    # O conteúdo depende apenas da versão dos dados, da rota e dos parâmetros; o cubo depende
+    # também do arquivo de hierarquia
+    identificador = esp.versao_dados()
+    if partes_caminho(caminho) == ["api", "cubo"]:
+        identificador = f"{identificador}.{esp.assinatura_hierarquia()}"
+    return '"{}-{}"'.format(identificador, hashlib.sha1(f"{caminho}?{consulta}".encode()).hexdigest()[:12])
+
+def aceita_gzip(cabecalho):
+    # Accept-Encoding com pesos: "gzip;q=0" recusa o gzip, e "*" vale apenas se gzip não for citado
+    pesos = {}
+    for item in cabecalho.split(","):
+        codificacao, *parametros = [parte.strip() for parte in item.split(";")]
+        peso = 1.0
+        for parametro in parametros:
+            chave, _, valor = parametro.partition("=")
+            if chave.strip().lower() == "q":
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[codificacao.lower()] = peso
+    return pesos.get("gzip", pesos.get("*", 0.0)) > 0
+
+def etag_gzip(etag):
+    # Cada codificação tem o seu ETag: os bytes da resposta comprimida são outros
+    return f'{etag[:-1]}-gz"'
+
+# ============================
+# Servidor HTTP
+# ============================
+class ManipuladorApi(BaseHTTPRequestHandler):
+    server_version = "SISAP-API/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parametros = parse_qs(url.query)
+        consulta = "&".join(f"{chave}={valor[-1]}" for chave, valor in sorted(parametros.items()))
+        try:
+            etag = calcular_etag(url.path, consulta)
+            usar_gzip = aceita_gzip(self.headers.get("Accept-Encoding", ""))
+            # As duas representações têm o mesmo conteúdo: qualquer uma delas valida o cache do cliente
+            enviados = [valor.strip() for valor in self.headers.get("If-None-Match", "").split(",")]
+            for candidato in ([etag_gzip(etag), etag] if usar_gzip else [etag]):
+                if candidato in enviados:
+                    self.enviar(304, etag=candidato)
+                    return
+            corpo, corpo_gzip = self.obter_resposta(etag, url.path, consulta, parametros)
+        except ErroApi as erro:
+            corpo = json.dumps({"erro": erro.mensagem}, ensure_ascii=False).encode("utf-8")
+            self.enviar(erro.status, corpo)
+            return
+        except Exception as erro:
+            corpo = json.dumps({"erro": f"Erro interno: {erro}"}, ensure_ascii=False).encode("utf-8")
+            self.enviar(500, corpo)
+            return
+
+        if corpo_gzip is not None and usar_gzip:
+            self.enviar(200, corpo_gzip, etag=etag_gzip(etag), codificacao="gzip")
+        else:
+            self.enviar(200, corpo, etag=etag)
+
+    def obter_resposta(self, etag, caminho, consulta, parametros):
+        with _lock_respostas:
+            if etag in _respostas:
+                _respostas.move_to_end(etag)
+                return _respostas[etag]
+        _, conteudo = resolver(caminho, parametros)
+        corpo = json.dumps(conteudo, ensure_ascii=False, default=str).encode("utf-8")
+        corpo_gzip = gzip.compress(corpo) if len(corpo) >= TAMANHO_MINIMO_GZIP else None
+        if calcular_etag(caminho, consulta) != etag:
+            # Os dados ou a hierarquia mudaram durante o cálculo: não guarda a resposta com o ETag antigo
+            return corpo, corpo_gzip
+        with _lock_respostas:
+            _respostas[etag] = (corpo, corpo_gzip)
+            while len(_respostas) > MAXIMO_RESPOSTAS_EM_CACHE:
+                _respostas.popitem(last=False)
+        return corpo, corpo_gzip
+
+    def enviar(self, status, corpo=b"", etag=None, codificacao=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            # Clientes podem guardar a resposta, mas devem revalidar com If-None-Match
+            self.send_header("Cache-Control", "no-cache")
+        if codificacao is not None:
+            self.send_header("Content-Encoding", codificacao)
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(corpo)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP somente leitura dos relatórios do SISAP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: 127.0.0.1)")
+    parser.add_argument("--porta", type=int, default=8502, help="Porta de escuta (padrão: 8502)")
+    args = parser.parse_args()
+
+    print("Calculando relatórios...")
+    try:
+        versao, relatorios = obter_relatorios()
+    except ErroApi as erro:
+        print(erro.mensagem, file=sys.stderr)
+        sys.exit(1)
+    print(f"Versão {versao}: {len(relatorios)} relatórios disponíveis.")
+
+    servidor = ThreadingHTTPServer((args.host, args.porta), ManipuladorApi)
+    print(f"API disponível em http://{args.host}:{args.porta}/api/versao")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
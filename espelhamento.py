@@ -4,6 +4,18 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 import locale
+import os
+import copy
+import time
+import json
+import hashlib
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import numpy as np
 
 # Tenta configurar o locale para pt_BR (opcional, apenas para fins locais)
 try:
@@ -14,16 +26,6 @@ except locale.Error:
     except locale.Error:
         pass
 
-# ============================
-# CONFIGURAÇÃO DA PÁGINA
-# ============================
-st.set_page_config(
-    page_title="SISAP - Análise Patrimonial",
-    page_icon="🏛️",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
 # ============================
 # CSS Personalizado
 # ============================
@@ -57,22 +59,41 @@ def load_custom_css():
 # ============================
 # FUNÇÃO: Carregar Dados
 # ============================
-@st.cache_data
-def load_data():
+ARQUIVO_DADOS = "02_06-2025_sisap_processado.xlsx" # CERTIFIQUE-SE QUE ESTE ARQUIVO EXISTE
+
+COLUNAS_NUMERICAS = ["Valor Contabil", "Valor", "Conta SIAFI", "Tombamento"]
+COLUNAS_DATA = ["Data de Ingresso"]
+
+def converter_tipos(df):
+    if "Data de Ingresso" in df.columns:
+        df["Data de Ingresso"] = pd.to_datetime(df["Data de Ingresso"], errors='coerce').dt.normalize()
+    if "Valor Contabil" in df.columns:
+        df["Valor Contabil"] = pd.to_numeric(df["Valor Contabil"], errors='coerce')
+    if "Valor" in df.columns:
+        df["Valor"] = pd.to_numeric(df["Valor"], errors='coerce')
+    if "Conta SIAFI" in df.columns:
+        df["Conta SIAFI"] = pd.to_numeric(df["Conta SIAFI"], errors='coerce')
+    if "Tombamento" in df.columns:
+        # Garante que a coluna Tombamento seja tratada como número, ignorando erros
+        df["Tombamento"] = pd.to_numeric(df["Tombamento"], errors='coerce')
+    return df
+
+# A versão dos dados faz parte da chave do cache: quando a planilha é substituída, a base, o
+# relatório de validação e os resultados da fila de tarefas mudam juntos
+@st.cache_data(max_entries=2)
+def load_data(versao):
     try:
-        file_name = "02_06-2025_sisap_processado.xlsx" # CERTIFIQUE-SE QUE ESTE ARQUIVO EXISTE
+        file_name = ARQUIVO_DADOS
         df = pd.read_excel(file_name)
-        if "Data de Ingresso" in df.columns:
-            df["Data de Ingresso"] = pd.to_datetime(df["Data de Ingresso"], errors='coerce').dt.normalize()
-        if "Valor Contabil" in df.columns:
-            df["Valor Contabil"] = pd.to_numeric(df["Valor Contabil"], errors='coerce')
-        if "Valor" in df.columns:
-            df["Valor"] = pd.to_numeric(df["Valor"], errors='coerce')
-        if "Conta SIAFI" in df.columns:
-            df["Conta SIAFI"] = pd.to_numeric(df["Conta SIAFI"], errors='coerce')
-        if "Tombamento" in df.columns:
-            # Garante que a coluna Tombamento seja tratada como número, ignorando erros
-            df["Tombamento"] = pd.to_numeric(df["Tombamento"], errors='coerce')
+        # Guarda os valores originais das colunas convertidas para a validação
+        bruto = df[[col for col in COLUNAS_NUMERICAS + COLUNAS_DATA if col in df.columns]].copy()
+        df = converter_tipos(df)
+        # Versão da base que foi de fato lida (a planilha pode ter mudado desde o cálculo da chave)
+        versao = versao_dados(file_name)
+        df.attrs["versao"] = versao
+        relatorio = validar_sem_interromper(versao, validar_bloco, bruto, df)
+        if relatorio is not None:
+            registrar_validacao(relatorio, versao)
         return df
     except FileNotFoundError:
         st.error(f"Erro: O arquivo '{file_name}' não foi encontrado. Verifique o caminho e o nome do arquivo.")
@@ -81,6 +102,492 @@ def load_data():
         st.error(f"Erro ao carregar os dados: {e}")
         return None
 
+# ============================
+# ESTADO PERSISTENTE ENTRE EXECUÇÕES
+# ============================
+# O Streamlit reexecuta este arquivo a cada interação e recria as variáveis do módulo, enquanto
+# as threads da fila de tarefas continuam usando as funções da primeira execução. O estado que
+# precisa durar entre execuções vem de cache_resource (sempre chamado aqui, na thread do script),
+# de modo que todas as execuções e todas as threads apontam para os mesmos dicionários.
+@st.cache_resource
+def estado_persistente(nome):
+    return {}
+
+_locks = estado_persistente("locks")
+
+def obter_lock(nome):
+    return _locks.setdefault(nome, threading.Lock())
+
+def caminho_temporario(destino):
+    # Processo e thread no nome: as sessões do Streamlit são threads de um mesmo processo
+    return f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+# ============================
+# FUNÇÃO: Versão dos Dados
+# ============================
+_cache_versao = estado_persistente("versoes")
+
+# Definida por servir.py: os processos do app usam a versão da base carregada em memória compartilhada
+VERSAO_COMPARTILHADA = os.environ.get("SISAP_VERSAO")
+
+def versao_dados(file_name=ARQUIVO_DADOS):
+    if VERSAO_COMPARTILHADA and file_name == ARQUIVO_DADOS:
+        return VERSAO_COMPARTILHADA
+    # Hash do conteúdo do arquivo, recalculado apenas quando o arquivo muda (data de modificação ou tamanho)
+    try:
+        info = os.stat(file_name)
+    except OSError:
+        return "indisponivel"
+    chave = (os.path.abspath(file_name), info.st_mtime_ns, info.st_size)
+    if chave not in _cache_versao:
+        sha = hashlib.sha256()
+        with open(file_name, "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+                sha.update(bloco)
+        _cache_versao[chave] = sha.hexdigest()[:16]
+    return _cache_versao[chave]
+
+# ============================
+# VALIDAÇÃO DOS DADOS NA CARGA
+# ============================
+# As falhas de conversão (valores que viram NaN/NaT com errors='coerce'), campos vazios e
+# valores fora da faixa são contados uma única vez, na carga, por coluna e por unidade.
+# O relatório guarda também as linhas da planilha com problema e é gravado em JSON ao lado
+# do snapshot, para ser consultado sem reprocessar a base.
+COLUNAS_ESPERADAS = ["Id", "Tombamento", "Bem Móvel", "Conta SIAFI", "Valor", "Valor Contabil", "Status", "Data de Ingresso"]
+
+# Persistentes: load_data (cache_data) valida apenas na primeira carga de cada versão
+_validacoes = estado_persistente("validacoes")
+_falhas_validacao = estado_persistente("falhas_validacao")
+
+def caminho_validacao(versao=None):
+    return os.path.join(PASTA_SNAPSHOTS, f"sisap_{versao or versao_dados()}.validacao.json")
+
+def registrar_ocorrencias(relatorio, verificacao, tipo, coluna, mascara, linhas, unidades):
+    mascara = np.asarray(mascara, dtype=bool)
+    relatorio["verificacoes"][verificacao] = {
+        "tipo": tipo,
+        "coluna": coluna,
+        "falhas": int(mascara.sum()),
+        "por_unidade": {str(k): int(v) for k, v in unidades[mascara].value_counts().items()},
+        "linhas": linhas[mascara].tolist(),
+    }
+
+def validar_bloco(bruto, convertido, inicio=0):
+    # inicio: posição do bloco na base; as linhas são numeradas como na planilha (cabeçalho na linha 1)
+    linhas = np.arange(inicio, inicio + len(convertido)) + 2
+    if "Id" in convertido.columns:
+        unidades = convertido["Id"].astype("string").fillna("N/A").reset_index(drop=True)
+    else:
+        unidades = pd.Series("N/A", index=range(len(convertido)))
+    relatorio = {
+        "total_registros": len(convertido),
+        "esquema": {
+            "colunas_ausentes": [col for col in COLUNAS_ESPERADAS if col not in convertido.columns],
+            "colunas_extras": [col for col in convertido.columns if col not in COLUNAS_ESPERADAS],
+        },
+        "verificacoes": {},
+    }
+
+    for col in COLUNAS_ESPERADAS:
+        if col not in convertido.columns:
+            continue
+        if col in bruto.columns:
+            original = bruto[col]
+            preenchido = original.notna() & original.astype("string").str.strip().ne("")
+            convertido_nulo = convertido[col].isna()
+            registrar_ocorrencias(relatorio, f"{col} inválido", "Conversão", col,
+                                  (preenchido & convertido_nulo).to_numpy(), linhas, unidades)
+            registrar_ocorrencias(relatorio, f"{col} vazio", "Campo vazio", col, (~preenchido).to_numpy(), linhas, unidades)
+        else:
+            vazio = convertido[col].isna() | convertido[col].astype("string").str.strip().eq("")
+            registrar_ocorrencias(relatorio, f"{col} vazio", "Campo vazio", col, vazio.to_numpy(), linhas, unidades)
+
+    for col in ["Valor", "Valor Contabil"]:
+        if col in convertido.columns:
+            registrar_ocorrencias(relatorio, f"{col} negativo", "Fora da faixa", col,
+                                  convertido[col].lt(0).to_numpy(), linhas, unidades)
+    if "Data de Ingresso" in convertido.columns:
+        datas = convertido["Data de Ingresso"]
+        fora_intervalo = (datas > DATA_LIMITE_FUTURA) | (datas < DATA_LIMITE_ANTIGA)
+        registrar_ocorrencias(relatorio, "Data de Ingresso fora do intervalo", "Fora da faixa", "Data de Ingresso",
+                              fora_intervalo.to_numpy(), linhas, unidades)
+    return relatorio
+
+def validar_sem_interromper(versao, funcao, *args):
+    # Um erro na validação não impede a carga dos dados; fica registrado para a aba Qualidade dos Dados
+    try:
+        return funcao(*args)
+    except Exception as e:
+        _falhas_validacao[versao] = str(e)
+        return None
+
+def combinar_validacao(acumulado, parcial):
+    if acumulado is None:
+        return parcial
+    acumulado["total_registros"] += parcial["total_registros"]
+    for nome, verificacao in parcial["verificacoes"].items():
+        destino = acumulado["verificacoes"][nome]
+        destino["falhas"] += verificacao["falhas"]
+        destino["linhas"].extend(verificacao["linhas"])
+        for unidade, qtd in verificacao["por_unidade"].items():
+            destino["por_unidade"][unidade] = destino["por_unidade"].get(unidade, 0) + qtd
+    return acumulado
+
+def registrar_validacao(relatorio, versao):
+    relatorio["versao"] = versao
+    _validacoes[versao] = relatorio
+    try:
+        os.makedirs(PASTA_SNAPSHOTS, exist_ok=True)
+        destino = caminho_validacao(versao)
+        temporario = caminho_temporario(destino)
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False)
+        os.replace(temporario, destino)
+    except OSError:
+        # Sem permissão de escrita o relatório continua disponível em memória
+        pass
+
+def carregar_validacao():
+    versao = versao_dados()
+    if versao not in _validacoes:
+        try:
+            with open(caminho_validacao(versao), encoding="utf-8") as arquivo:
+                _validacoes[versao] = json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+    return _validacoes[versao]
+
+def aviso_registros_invalidos(*colunas):
+    # As abas não refazem a verificação: as contagens de valores vazios ou não convertidos vêm da validação da carga
+    relatorio = carregar_validacao()
+    if relatorio is None:
+        return
+    partes = []
+    for col in colunas:
+        qtd = sum(relatorio["verificacoes"].get(f"{col} {tipo}", {}).get("falhas", 0) for tipo in ["inválido", "vazio"])
+        if qtd:
+            partes.append(f"{qtd:,} sem '{col}' válido".replace(",", "."))
+    if partes:
+        st.caption(f"Registros fora desta análise: {'; '.join(partes)}. Detalhes na aba Qualidade dos Dados.")
+
+# ============================
+# MODO EM BLOCOS (BASES MAIORES QUE A MEMÓRIA)
+# ============================
+# Com SISAP_MODO_BLOCOS=1 a planilha é convertida uma única vez, lendo-a em streaming, para um
+# snapshot colunar (Parquet) e as abas passam a ler esse snapshot em blocos de TAMANHO_BLOCO
+# linhas. Somas, contagens, Top N e filtros são calculados por bloco e os parciais são
+# combinados, de modo que o pico de memória depende do tamanho do bloco e não da base.
+ARQUIVO_COMPARTILHADO = os.environ.get("SISAP_ARQUIVO_COMPARTILHADO")
+MODO_BLOCOS = os.environ.get("SISAP_MODO_BLOCOS", "0") == "1" and not ARQUIVO_COMPARTILHADO
+TAMANHO_BLOCO = int(os.environ.get("SISAP_TAMANHO_BLOCO", 50_000))
+PASTA_SNAPSHOTS = os.environ.get("SISAP_SNAPSHOTS", "snapshots")
+
+def caminho_snapshot(versao=None):
+    return os.path.join(PASTA_SNAPSHOTS, f"sisap_{versao or versao_dados()}.parquet")
+
+def padronizar_bloco(df):
+    # Tipos fixos para que todos os blocos gravados no snapshot tenham o mesmo esquema
+    df = converter_tipos(df)
+    for col in df.columns:
+        if col in COLUNAS_NUMERICAS:
+            df[col] = df[col].astype("float64")
+        elif col in COLUNAS_DATA:
+            df[col] = df[col].astype("datetime64[ns]")
+        else:
+            df[col] = df[col].astype("string")
+    return df
+
+def esquema_snapshot(colunas):
+    campos = []
+    for col in colunas:
+        if col in COLUNAS_NUMERICAS:
+            campos.append(pa.field(col, pa.float64()))
+        elif col in COLUNAS_DATA:
+            campos.append(pa.field(col, pa.timestamp("ns")))
+        else:
+            campos.append(pa.field(col, pa.string()))
+    return pa.schema(campos)
+
+def gerar_snapshot(file_name=ARQUIVO_DADOS, tamanho_bloco=TAMANHO_BLOCO):
+    destino = caminho_snapshot(versao_dados(file_name))
+    if os.path.exists(destino):
+        return destino
+    # Várias sessões podem pedir o snapshot ao mesmo tempo na primeira carga: só uma o gera
+    with obter_lock(destino):
+        if not os.path.exists(destino):
+            escrever_snapshot(file_name, destino, tamanho_bloco)
+    return destino
+
+def escrever_snapshot(file_name, destino, tamanho_bloco):
+    os.makedirs(PASTA_SNAPSHOTS, exist_ok=True)
+    temporario = caminho_temporario(destino)
+
+    # Leitura em streaming (read_only) para não carregar a planilha inteira
+    workbook = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+    writer = None
+    try:
+        linhas = workbook.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(next(linhas))]
+        schema = esquema_snapshot(cabecalho)
+        colunas_tipadas = [col for col in COLUNAS_NUMERICAS + COLUNAS_DATA if col in cabecalho]
+        writer = pq.ParquetWriter(temporario, schema)
+        versao = versao_dados(file_name)
+        validacao = None
+        validacao_ok = True
+        inicio = 0
+        while True:
+            bloco = list(islice(linhas, tamanho_bloco))
+            if not bloco:
+                break
+            df_bloco = pd.DataFrame(bloco, columns=cabecalho)
+            bruto = df_bloco[colunas_tipadas].copy()
+            df_bloco = padronizar_bloco(df_bloco)
+            if validacao_ok:
+                parcial = validar_sem_interromper(versao, validar_bloco, bruto, df_bloco, inicio)
+                validacao_ok = parcial is not None
+                validacao = combinar_validacao(validacao, parcial) if validacao_ok else None
+            inicio += len(df_bloco)
+            writer.write_table(pa.Table.from_pandas(df_bloco, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+        workbook.close()
+    if validacao is not None:
+        registrar_validacao(validacao, versao)
+    os.replace(temporario, destino)
+
+def ler_blocos(colunas=None):
+    arquivo = pq.ParquetFile(gerar_snapshot())
+    for lote in arquivo.iter_batches(batch_size=TAMANHO_BLOCO, columns=colunas):
+        yield lote.to_pandas()
+
+def carregar_colunas(colunas):
+    # Leitura apenas das colunas pedidas, para análises que precisam de todos os registros
+    return pd.read_parquet(gerar_snapshot(), columns=colunas)
+
+def carregar_base():
+    # Em modo blocos devolve apenas a estrutura (DataFrame vazio com as colunas do snapshot);
+    # os dados são lidos em blocos pelas funções abaixo
+    if ARQUIVO_COMPARTILHADO:
+        try:
+            return carregar_memoria_compartilhada(ARQUIVO_COMPARTILHADO)
+        except Exception as e:
+            st.error(f"Erro ao abrir a base em memória compartilhada '{ARQUIVO_COMPARTILHADO}': {e}")
+            return None
+    # A base leva a sua versão em attrs["versao"], para que os resultados gravados em disco
+    # (cubo) usem a versão dos dados de que foram calculados
+    if not MODO_BLOCOS:
+        return load_data(versao_dados())
+    try:
+        estrutura = pq.read_schema(gerar_snapshot()).empty_table().to_pandas()
+        estrutura.attrs["versao"] = versao_dados()
+        return estrutura
+    except FileNotFoundError:
+        st.error(f"Erro: O arquivo '{ARQUIVO_DADOS}' não foi encontrado. Verifique o caminho e o nome do arquivo.")
+        return None
+    except Exception as e:
+        st.error(f"Erro ao gerar o snapshot dos dados: {e}")
+        return None
+
+def agregar_por(data, chave, agregacoes, filtro=None, dropna=True):
+    # chave: coluna ou lista de colunas
+    # agregacoes: {coluna_saida: (coluna_origem, "sum" | "count" | "size")}; todas são combináveis por soma
+    # filtro: aplicado à base (ou a cada bloco) antes do agrupamento, para filtrar ou derivar colunas
+    if not MODO_BLOCOS:
+        base = filtro(data) if filtro is not None else data
+        return base.groupby(chave, as_index=False, dropna=dropna).agg(**agregacoes)
+    combinacao = {saida: (saida, "sum") for saida in agregacoes}
+    acumulado = None
+    for bloco in ler_blocos():
+        base = filtro(bloco) if filtro is not None else bloco
+        parcial = base.groupby(chave, as_index=False, dropna=dropna).agg(**agregacoes)
+        if acumulado is not None:
+            parcial = pd.concat([acumulado, parcial], ignore_index=True).groupby(
+                chave, as_index=False, dropna=dropna
+            ).agg(**combinacao)
+        acumulado = parcial
+    if acumulado is None:
+        chaves = [chave] if isinstance(chave, str) else list(chave)
+        return pd.DataFrame(columns=[*chaves, *agregacoes])
+    return acumulado
+
+def maiores_valores(data, n, coluna, por=None):
+    def selecionar(df):
+        if por is None:
+            return df.nlargest(n, coluna)
+        return df.groupby(por, group_keys=False, observed=True).apply(lambda x: x.nlargest(n, coluna))
+
+    if not MODO_BLOCOS:
+        return selecionar(data).reset_index(drop=True)
+    # Os N maiores da base estão entre os N maiores de cada bloco; os anteriores vêm primeiro
+    # no concat, preservando o desempate por ordem original do nlargest
+    acumulado = None
+    for bloco in ler_blocos():
+        parcial = selecionar(bloco)
+        if acumulado is not None:
+            parcial = selecionar(pd.concat([acumulado, parcial], ignore_index=True))
+        acumulado = parcial.reset_index(drop=True)
+    return acumulado if acumulado is not None else data.copy()
+
+def filtrar_registros(data, filtro):
+    if not MODO_BLOCOS:
+        return filtro(data).copy()
+    partes = [filtro(bloco) for bloco in ler_blocos()]
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return data.iloc[0:0].copy()
+    return pd.concat(partes, ignore_index=True)
+
+# ============================
+# MEMÓRIA COMPARTILHADA (VÁRIOS PROCESSOS DO APP)
+# ============================
+# Quando iniciado por servir.py, cada processo recebe em SISAP_ARQUIVO_COMPARTILHADO o caminho
+# de um arquivo Arrow IPC (em /dev/shm) com a base já convertida. O arquivo é mapeado em memória
+# somente leitura e as colunas de texto ficam como string[pyarrow] apontando para as páginas
+# mapeadas, compartilhadas por todos os processos; só as colunas numéricas e de data são copiadas.
+def tipo_pandas_compartilhado(tipo):
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return pd.StringDtype("pyarrow")
+    return None
+
+# cache_resource (e não cache_data) para não copiar a base a cada execução do script
+@st.cache_resource
+def carregar_memoria_compartilhada(caminho):
+    tabela = pa.ipc.open_file(pa.memory_map(caminho, "r")).read_all()
+    base = tabela.to_pandas(types_mapper=tipo_pandas_compartilhado)
+    base.attrs["versao"] = versao_dados()
+    return base
+
+# ============================
+# FILTROS DAS ABAS
+# ============================
+DATA_LIMITE_FUTURA = pd.to_datetime("2025-12-31")
+DATA_LIMITE_ANTIGA = pd.to_datetime("1900-01-01")
+
+def filtro_valor_discrepante(d):
+    return d[d["Valor Contabil"] > d["Valor"]]
+
+def filtro_data_discrepante(d):
+    # Coluna já convertida na carga; datas inválidas (NaT) são contadas na validação
+    datas = d["Data de Ingresso"]
+    return d[datas.notna() & ((datas > DATA_LIMITE_FUTURA) | (datas < DATA_LIMITE_ANTIGA))]
+
+def filtro_conta_siafi_18(d):
+    return d[d["Conta SIAFI"] == 18]
+
+def filtro_centavos(d):
+    return d[d["Valor"].notna() & (d["Valor"] <= 0.01)]
+
+# ============================
+# FILA DE TAREFAS EM SEGUNDO PLANO
+# ============================
+# Os cálculos pesados rodam em um pool de threads compartilhado por todas as sessões.
+# Tarefas idênticas (mesmo nome e mesma versão dos dados) são executadas uma única vez:
+# dez auditores abrindo o mesmo relatório aguardam o mesmo cálculo.
+TRABALHADORES_SEGUNDO_PLANO = int(os.environ.get("SISAP_TRABALHADORES", min(4, os.cpu_count() or 1)))
+INTERVALO_ACOMPANHAMENTO = 1.0 # segundos entre as consultas de andamento na interface
+
+# Tarefa em execução em cada thread do pool, indexada pelo identificador da thread
+_tarefas_em_execucao = estado_persistente("tarefas_em_execucao")
+
+def reportar_progresso(fracao, etapa=None):
+    # Pode ser chamada de dentro de qualquer cálculo; fora de uma tarefa não faz nada
+    tarefa = _tarefas_em_execucao.get(threading.get_ident())
+    if tarefa is not None:
+        tarefa.progresso = max(0.0, min(1.0, fracao))
+        if etapa:
+            tarefa.etapa = etapa
+
+class Tarefa:
+    def __init__(self, nome):
+        self.nome = nome
+        self.progresso = 0.0
+        self.etapa = "Na fila"
+        self.criada_em = time.monotonic()
+        self.iniciada_em = None
+        self.future = None
+
+    def executar(self, funcao, args):
+        _tarefas_em_execucao[threading.get_ident()] = self
+        self.iniciada_em = time.monotonic()
+        self.etapa = "Em execução"
+        try:
+            return funcao(*args)
+        finally:
+            _tarefas_em_execucao.pop(threading.get_ident(), None)
+
+    @property
+    def finalizada(self):
+        return self.future.done()
+
+    @property
+    def falhou(self):
+        return self.future.done() and self.future.exception() is not None
+
+    @property
+    def tempo_decorrido(self):
+        return time.monotonic() - (self.iniciada_em or self.criada_em)
+
+class FilaTarefas:
+    def __init__(self, max_workers):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sisap-tarefa")
+        self._tarefas = {}
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def submeter(self, nome, funcao, *args):
+        versao = versao_dados()
+        with self._lock:
+            if versao != self._versao:
+                # Nova versão dos dados: resultados antigos não servem mais
+                self._tarefas = {}
+                self._versao = versao
+            tarefa = self._tarefas.get(nome)
+            # Tarefas com falha continuam guardadas, para que o erro seja exibido; só são
+            # executadas de novo quando alguém pede (descartar)
+            if tarefa is None:
+                tarefa = Tarefa(nome)
+                tarefa.future = self._executor.submit(tarefa.executar, funcao, args)
+                self._tarefas[nome] = tarefa
+            return tarefa
+
+    def descartar(self, nome, tarefa):
+        # Remove a tarefa, se ainda for a atual, para que o próximo pedido a execute de novo
+        with self._lock:
+            if self._tarefas.get(nome) is tarefa:
+                del self._tarefas[nome]
+
+@st.cache_resource
+def obter_fila_tarefas():
+    return FilaTarefas(TRABALHADORES_SEGUNDO_PLANO)
+
+def acompanhar_tarefa(tarefa):
+    @st.fragment(run_every=INTERVALO_ACOMPANHAMENTO)
+    def _painel_andamento():
+        if tarefa.finalizada:
+            st.rerun()
+        st.progress(tarefa.progresso, text=f"⏳ {tarefa.etapa} ({tarefa.tempo_decorrido:.0f}s)")
+    _painel_andamento()
+
+# Recriado a cada execução do script: numera os botões de uma mesma tarefa exibida em mais de uma aba
+_botoes_nova_tentativa = {}
+
+def calcular_em_segundo_plano(nome, funcao, *args):
+    # Retorna o resultado se já estiver pronto; caso contrário mostra o andamento e retorna None
+    tarefa = obter_fila_tarefas().submeter(nome, funcao, *args)
+    if not tarefa.finalizada:
+        acompanhar_tarefa(tarefa)
+        return None
+    if tarefa.falhou:
+        st.error(f"Erro ao calcular '{nome}': {tarefa.future.exception()}")
+        _botoes_nova_tentativa[nome] = _botoes_nova_tentativa.get(nome, 0) + 1
+        st.button("Tentar novamente", key=f"tentar_novamente:{nome}:{_botoes_nova_tentativa[nome]}",
+                  on_click=obter_fila_tarefas().descartar, args=(nome, tarefa))
+        return None
+    # O resultado é compartilhado entre sessões; cada aba recebe a sua cópia para poder alterá-la
+    return copy.deepcopy(tarefa.future.result())
+
 # ============================
 # FUNÇÃO: Formatar Valores
 # ============================
@@ -131,6 +638,9 @@ def exibir_apresentacao():
       <li><b>Centavos</b>: Apresenta um resumo por unidade e o detalhamento dos bens com valor contábil igual ou inferior a R$ 0,01.</li>
       <li><b>Conta SIAFI</b>: Agrupa os dados por Conta SIAFI, exibindo o total de itens, valor de aquisição total e valor contábil total para cada conta.</li>
       <li><b>Bens</b>: Analisa e resume a situação dos bens com base no seu status (Regular vs. Diversos), considerando os 03 bens patrimoniais de maior em cada unidade.</li>
+      <li><b>Consolidação</b>: Consolida quantidade, valor analisado e valor contábil por campus, diretoria (hierarquia configurável de unidades), conta SIAFI, status e ano de ingresso.</li>
+      <li><b>Qualidade dos Dados</b>: Resume, por coluna e por unidade, os valores que não puderam ser convertidos, campos vazios e valores fora da faixa encontrados na carga da planilha.</li>
+      <li><b>Duplicidades</b>: Aponta Tombamentos informados mais de uma vez e bens com mesma descrição, valor e data de ingresso em unidades diferentes, com Tombamentos diferentes.</li>
     </ul>
     """
     st.markdown(funcionalidades, unsafe_allow_html=True)
@@ -143,12 +653,34 @@ def exibir_apresentacao():
     **E-mail**: processamento.dpm.cap@id.uff.br
     """)
 
+# ============================
+# FUNÇÃO: Calcular Carga Patrimonial por Unidade
+# ============================
+def calcular_carga_patrimonial(data):
+    # Agregação: Soma tanto o 'Valor Contabil' quanto o 'Valor'
+    df_resumo_unidade = agregar_por(data, "Id", {
+        "Soma_Valor_Contabil": ("Valor Contabil", "sum"),
+        "Soma_Valor": ("Valor", "sum"),
+        "Contagem_Bens": ("Id", "count")
+    })
+    
+    # Ordenação: Agora ordena pelo 'Soma_Valor' para refletir no gráfico
+    df_resumo_unidade = df_resumo_unidade.sort_values("Soma_Valor", ascending=False)
+    
+    # Renomeia colunas numéricas para uso interno (gráfico e cálculos)
+    df_resumo_unidade.rename(columns={
+        "Soma_Valor": "_Valor_Numerico",
+        "Soma_Valor_Contabil": "_Valor_Contabil_Numerico", 
+        "Contagem_Bens": "Total de Bens"
+    }, inplace=True)
+    return df_resumo_unidade
+
 # ============================
 # ABA: Carga Patrimonial (MODIFICADA CONFORME SOLICITAÇÃO)
 # ============================
 def exibir_carga_patrimonial():
     st.subheader("📊 Carga Patrimonial por Unidade")
-    data_original = load_data()
+    data_original = carregar_base()
     if data_original is None: return
 
     # 1. Validação: Agora verifica também a existência da coluna "Valor"
@@ -158,22 +690,9 @@ def exibir_carga_patrimonial():
         st.warning(f"Colunas essenciais não encontradas: {', '.join(missing_cols)}. Não é possível gerar a carga patrimonial.")
         return
 
-    # 2. Agregação: Soma tanto o 'Valor Contabil' quanto o 'Valor'
-    df_resumo_unidade = data_original.groupby("Id", as_index=False).agg(
-        Soma_Valor_Contabil=("Valor Contabil", "sum"),
-        Soma_Valor=("Valor", "sum"),
-        Contagem_Bens=("Id", "count")
-    )
-    
-    # 3. Ordenação: Agora ordena pelo 'Soma_Valor' para refletir no gráfico
-    df_resumo_unidade = df_resumo_unidade.sort_values("Soma_Valor", ascending=False)
-    
-    # Renomeia colunas numéricas para uso interno (gráfico e cálculos)
-    df_resumo_unidade.rename(columns={
-        "Soma_Valor": "_Valor_Numerico",
-        "Soma_Valor_Contabil": "_Valor_Contabil_Numerico", 
-        "Contagem_Bens": "Total de Bens"
-    }, inplace=True)
+    # 2. Agregação e 3. Ordenação: calculadas em segundo plano
+    df_resumo_unidade = calcular_em_segundo_plano("carga_patrimonial", calcular_carga_patrimonial, data_original)
+    if df_resumo_unidade is None: return
     
     # 4. Criação de Colunas: Cria as colunas formatadas com os novos títulos solicitados
     df_resumo_unidade["Valor Analisado (R$)"] = df_resumo_unidade["_Valor_Numerico"].apply(format_currency)
@@ -227,12 +746,18 @@ def exibir_carga_patrimonial():
     
     st.altair_chart(chart, use_container_width=True)
 
+# ============================
+# FUNÇÃO: Calcular os 3 Bens de Maior Valor por Unidade
+# ============================
+def calcular_top3_por_unidade(data):
+    return maiores_valores(data, 3, "Valor", por="Id")
+
 # ============================
 # ABA: Bens de Alto Valor
 # ============================
 def exibir_bens_alto_valor():
     st.subheader("💎 Ativos de Alto Valor por Unidade")
-    data = load_data()
+    data = carregar_base()
     if data is None: return
 
     # ALTERAÇÃO 1: Adicionadas as colunas 'Valor' e 'Status' aos requisitos
@@ -241,11 +766,11 @@ def exibir_bens_alto_valor():
         missing = [col for col in required_cols if col not in data.columns]
         st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar a lista de bens de alto valor.")
         return
+    aviso_registros_invalidos("Valor")
 
     # 03 Primeiros Bens de Alto Valor de cada Id Unico
-    df_trabalho = data.groupby("Id", group_keys=False, observed=True).apply(
-        lambda x: x.nlargest(3, "Valor")
-    ).reset_index(drop=True)
+    df_trabalho = calcular_em_segundo_plano("top3_por_unidade", calcular_top3_por_unidade, data)
+    if df_trabalho is None: return
     df_trabalho.dropna(subset=['Valor'], inplace=True)
 
     if df_trabalho.empty:
@@ -282,12 +807,18 @@ def exibir_bens_alto_valor():
         }, height=400, use_container_width=True
     )
 
+# ============================
+# FUNÇÃO: Calcular os 10 Bens de Maior Valor da Instituição
+# ============================
+def calcular_top10_institucional(data):
+    return maiores_valores(data, 10, "Valor")
+
 # ============================
 # ABA: Top 10 Institucional
 # ============================
 def exibir_top_10():
     st.subheader("🏆 Top 10 Bens de Alto Valor Institucional")
-    data = load_data()
+    data = carregar_base()
     if data is None: return
 
     # ALTERAÇÃO 1: Adicionadas as colunas 'Valor' e 'Status' aos requisitos
@@ -296,8 +827,10 @@ def exibir_top_10():
         missing = [col for col in required_cols if col not in data.columns]
         st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar o Top 10.")
         return
+    aviso_registros_invalidos("Valor")
 
-    df_trabalho = data.nlargest(10, "Valor").reset_index(drop=True)
+    df_trabalho = calcular_em_segundo_plano("top10_institucional", calcular_top10_institucional, data)
+    if df_trabalho is None: return
     df_trabalho.dropna(subset=['Valor'], inplace=True)
 
     if df_trabalho.empty:
@@ -340,7 +873,7 @@ def exibir_aba_bens():
     # Título da aba atualizado para refletir a nova funcionalidade
     st.subheader("🔎 Bens de Maior Valor: Visão por Status")
 
-    data_original = load_data()
+    data_original = carregar_base()
     if data_original is None: return
 
     # Verificação de colunas necessárias para a nova lógica
@@ -351,9 +884,8 @@ def exibir_aba_bens():
         return
 
     # Busca os 3 bens de maior valor (coluna 'Valor') para cada Id único.
-    df_trabalho = data_original.groupby("Id", group_keys=False, observed=True).apply(
-        lambda x: x.nlargest(3, "Valor")
-    ).reset_index(drop=True)
+    df_trabalho = calcular_em_segundo_plano("top3_por_unidade", calcular_top3_por_unidade, data_original)
+    if df_trabalho is None: return
 
     if df_trabalho.empty:
         st.error("Nenhum bem encontrado para realizar a análise. Verifique os dados de origem.")
@@ -435,12 +967,14 @@ def exibir_aba_bens():
     st.markdown("---")
     st.markdown("##### Resumo por Status dos Bens")
 
-    df_regular = df_trabalho[df_trabalho['Status'] == 'Regular']
+    # fillna: em memória compartilhada o Status vazio compara como <NA>; é contado em "Diversos"
+    status_regular = df_trabalho['Status'].eq('Regular').fillna(False).astype(bool)
+    df_regular = df_trabalho[status_regular]
     quantidade_regular = len(df_regular)
     valor_ingresso_regular = df_regular['Valor'].sum()
     valor_contabil_regular = df_regular['Valor Contabil'].sum()
 
-    df_irregular = df_trabalho[df_trabalho['Status'] != 'Regular']
+    df_irregular = df_trabalho[~status_regular]
     quantidade_irregular = len(df_irregular)
     valor_ingresso_irregular = df_irregular['Valor'].sum()
     valor_contabil_irregular = df_irregular['Valor Contabil'].sum()
@@ -461,12 +995,18 @@ def exibir_aba_bens():
 
     st.markdown("---")
 
+# ============================
+# FUNÇÃO: Calcular Bens com Valor Contábil > Valor
+# ============================
+def calcular_valor_discrepante(data):
+    return filtrar_registros(data, filtro_valor_discrepante).sort_values("Valor Contabil", ascending=False)
+
 # ============================
 # ABA: Relatório (Valor Contábil > Valor)
 # ============================
 def exibir_valor_discrepante():
     st.subheader("📝 Relatório: Bens com Valor Contábil Superior ao Valor de Aquisição")
-    data = load_data()
+    data = carregar_base()
     if data is None: return
 
     required_cols = ["Id", "Valor Contabil", "Valor", "Tombamento", "Bem Móvel", "Conta SIAFI"]
@@ -474,14 +1014,15 @@ def exibir_valor_discrepante():
         missing = [col for col in required_cols if col not in data.columns]
         st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar o relatório de valor discrepante.")
         return
+    aviso_registros_invalidos("Valor", "Valor Contabil")
     
-    df_trabalho = data[data["Valor Contabil"] > data["Valor"]].copy()
+    df_trabalho = calcular_em_segundo_plano("valor_discrepante", calcular_valor_discrepante, data)
+    if df_trabalho is None: return
 
     if df_trabalho.empty:
         st.info("Nenhum registro encontrado onde o Valor Contábil seja superior ao Valor de Aquisição.")
         return
 
-    df_trabalho.sort_values("Valor Contabil", ascending=False, inplace=True)
     df_trabalho["Valor Aquisição Formatado"] = df_trabalho["Valor"].apply(format_currency)
     df_trabalho["Valor Contabil Formatado"] = df_trabalho["Valor Contabil"].apply(format_currency)
 
@@ -505,8 +1046,8 @@ def exibir_valor_discrepante():
         }, height=400, use_container_width=True
     )
 
-    total_valor_aquisicao = df_trabalho["Valor"].dropna().sum()
-    total_valor_contabil = df_trabalho["Valor Contabil"].dropna().sum()
+    total_valor_aquisicao = df_trabalho["Valor"].sum()
+    total_valor_contabil = df_trabalho["Valor Contabil"].sum()
     qtd_registros = len(df_trabalho)
 
     st.markdown("---"); st.markdown("### Resumo dos Itens com Divergência")
@@ -515,12 +1056,18 @@ def exibir_valor_discrepante():
     col2.metric("Total Valor Contábil (R$)", format_currency(total_valor_contabil))
     col3.metric("Qtd. Registros", f"{qtd_registros:,}".replace(",", "."))
 
+# ============================
+# FUNÇÃO: Calcular Bens com Data de Ingresso Discrepante
+# ============================
+def calcular_data_discrepante(data):
+    return filtrar_registros(data, filtro_data_discrepante)
+
 # ============================
 # ABA: Data Discrepante
 # ============================
 def exibir_data_discrepante():
     st.subheader("📅 Data de Ingresso Discrepante")
-    data_original = load_data()
+    data_original = carregar_base()
     if data_original is None: return
 
     data = data_original.copy()
@@ -533,17 +1080,13 @@ def exibir_data_discrepante():
         missing = [col for col in required_cols_base if col not in data.columns]
         st.warning(f"Colunas base necessárias não encontradas: {', '.join(missing)}. Não é possível gerar o relatório de data discrepante.")
         return
+    aviso_registros_invalidos("Data de Ingresso")
 
-    data["Data de Ingresso Convertida"] = pd.to_datetime(data["Data de Ingresso"], errors="coerce")
-    data_valid_dates = data.dropna(subset=["Data de Ingresso Convertida"]).copy()
+    data_limite_futura = DATA_LIMITE_FUTURA
+    data_limite_antiga = DATA_LIMITE_ANTIGA
 
-    data_limite_futura = pd.to_datetime("2025-12-31")
-    data_limite_antiga = pd.to_datetime("1900-01-01")
-
-    df_data_discrepante = data_valid_dates[
-        (data_valid_dates["Data de Ingresso Convertida"] > data_limite_futura) |
-        (data_valid_dates["Data de Ingresso Convertida"] < data_limite_antiga)
-    ].copy()
+    df_data_discrepante = calcular_em_segundo_plano("data_discrepante", calcular_data_discrepante, data)
+    if df_data_discrepante is None: return
 
     if df_data_discrepante.empty:
         st.info(f"Nenhum registro com data de ingresso posterior a {data_limite_futura.strftime('%d/%m/%Y')} ou anterior a {data_limite_antiga.strftime('%d/%m/%Y')} encontrado, ou com datas inválidas.")
@@ -552,7 +1095,7 @@ def exibir_data_discrepante():
     df_data_discrepante["Valor Aquisição Formatado"] = df_data_discrepante["Valor"].apply(format_currency)
     df_data_discrepante["Valor Contabil Formatado"] = df_data_discrepante["Valor Contabil"].apply(format_currency)
     
-    df_data_discrepante["Data de Ingresso Formatada"] = df_data_discrepante["Data de Ingresso Convertida"].dt.strftime("%d/%m/%Y")
+    df_data_discrepante["Data de Ingresso Formatada"] = df_data_discrepante["Data de Ingresso"].dt.strftime("%d/%m/%Y")
     
     col_data_display_name = "Data de Ingresso"
     col_data_source_for_df = "Data de Ingresso Formatada"
@@ -570,8 +1113,8 @@ def exibir_data_discrepante():
     )
 
     total_registros = len(df_data_discrepante)
-    total_valor_aquisicao = df_data_discrepante["Valor"].dropna().sum()
-    total_valor_contabil = df_data_discrepante["Valor Contabil"].dropna().sum()
+    total_valor_aquisicao = df_data_discrepante["Valor"].sum()
+    total_valor_contabil = df_data_discrepante["Valor Contabil"].sum()
 
     st.markdown("---"); st.markdown("### Resumo Consolidado dos Itens com Data Discrepante")
     col1, col2, col3 = st.columns(3)
@@ -579,12 +1122,26 @@ def exibir_data_discrepante():
     col2.metric("Total Valor Aquisição (R$)", format_currency(total_valor_aquisicao))
     col3.metric("Total Valor Contábil (R$)", format_currency(total_valor_contabil))
 
+# ============================
+# FUNÇÃO: Calcular Resumo por Unidade da Conta SIAFI 18
+# ============================
+def calcular_resumo_siafi_18(df_trabalho):
+    return df_trabalho.groupby("Id", as_index=False).agg(
+        Quantidade_Bens_Siafi18=("Tombamento", "count"),
+        _Soma_Valor_Analisado_Numerico=("Valor", "sum"),
+        _Soma_Valor_Contabil_Siafi18_Numerico=("Valor Contabil", "sum")
+    ).sort_values("_Soma_Valor_Contabil_Siafi18_Numerico", ascending=False)
+
+def calcular_conta_siafi_18(data):
+    df_trabalho = filtrar_registros(data, filtro_conta_siafi_18)
+    return df_trabalho, calcular_resumo_siafi_18(df_trabalho)
+
 # ============================
 # ABA: Conta Siafi 18 - Livros
 # ============================
 def exibir_conta_siafi_18():
     st.subheader("📚 Conta SIAFI 18 - Livros e Documentos")
-    data_original = load_data()
+    data_original = carregar_base()
     if data_original is None:
         return
 
@@ -596,7 +1153,10 @@ def exibir_conta_siafi_18():
         st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar a aba Conta SIAFI 18.")
         return
     
-    df_trabalho = data[data["Conta SIAFI"] == 18].copy()
+    resultado = calcular_em_segundo_plano("conta_siafi_18", calcular_conta_siafi_18, data)
+    if resultado is None:
+        return
+    df_trabalho, df_resumo_id_siafi18 = resultado
 
     if df_trabalho.empty:
         st.info("Nenhum registro encontrado para a Conta SIAFI 18 (Livros e Documentos).")
@@ -604,12 +1164,6 @@ def exibir_conta_siafi_18():
 
     st.markdown("##### Detalhamento por Unidade (Conta SIAFI 18)")
     
-    df_resumo_id_siafi18 = df_trabalho.groupby("Id", as_index=False).agg(
-        Quantidade_Bens_Siafi18=("Tombamento", "count"),
-        _Soma_Valor_Analisado_Numerico=("Valor", "sum"),
-        _Soma_Valor_Contabil_Siafi18_Numerico=("Valor Contabil", "sum")
-    ).sort_values("_Soma_Valor_Contabil_Siafi18_Numerico", ascending=False)
-    
     df_resumo_id_siafi18["Valor Analisado Total (R$)"] = df_resumo_id_siafi18["_Soma_Valor_Analisado_Numerico"].apply(format_currency)
     df_resumo_id_siafi18["Valor Contábil Analisado Total (R$)"] = df_resumo_id_siafi18["_Soma_Valor_Contabil_Siafi18_Numerico"].apply(format_currency)
     
@@ -653,8 +1207,8 @@ def exibir_conta_siafi_18():
     ids_unicos_na_conta18 = df_trabalho["Id"].nunique()
     quantidade_total_bens_conta18 = len(df_trabalho)
     
-    soma_total_valor_analisado_conta18 = df_trabalho["Valor"].dropna().sum()
-    soma_total_valor_contabil_conta18 = df_trabalho["Valor Contabil"].dropna().sum()
+    soma_total_valor_analisado_conta18 = df_trabalho["Valor"].sum()
+    soma_total_valor_contabil_conta18 = df_trabalho["Valor Contabil"].sum()
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Unidades (Id) Distintas com Itens na Conta 18", f"{ids_unicos_na_conta18}")
@@ -662,12 +1216,26 @@ def exibir_conta_siafi_18():
     col3.metric("Valor Analisado Total da Conta 18 (R$)", format_currency(soma_total_valor_analisado_conta18))
     col4.metric("Valor Contábil Analisado Total da Conta 18 (R$)", format_currency(soma_total_valor_contabil_conta18))
 
+# ============================
+# FUNÇÃO: Calcular Resumo por Unidade dos Bens com Valor Residual
+# ============================
+def calcular_resumo_centavos(df_trabalho_centavos):
+    return df_trabalho_centavos.groupby("Id", as_index=False).agg(
+        Quantidade_Bens_Centavos=("Tombamento", "count"), 
+        _Soma_Valor_Analisado_Numerico=("Valor", "sum"),
+        _Soma_Valor_Contabil_Numerico=("Valor Contabil", "sum")
+    ).sort_values("_Soma_Valor_Analisado_Numerico", ascending=True)
+
+def calcular_centavos(data):
+    df_trabalho_centavos = filtrar_registros(data, filtro_centavos)
+    return df_trabalho_centavos, calcular_resumo_centavos(df_trabalho_centavos)
+
 # ============================
 # ABA: Centavos
 # ============================
 def exibir_aba_centavos():
     st.subheader("🪙 Bens com Valor Residual (Centavos)")
-    data_original = load_data()
+    data_original = carregar_base()
     if data_original is None:
         return
 
@@ -678,23 +1246,22 @@ def exibir_aba_centavos():
         missing = [col for col in required_cols_base_centavos if col not in data.columns]
         st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar a aba Centavos.")
         return
+    aviso_registros_invalidos("Valor")
     
-    # Criando a nova coluna "Valor Analisado"
-    data["Valor Analisado"] = data["Valor"]
+    # Aplicando o filtro **apenas** na coluna "Valor" (≤ 0,01)
+    resultado = calcular_em_segundo_plano("centavos", calcular_centavos, data)
+    if resultado is None:
+        return
+    df_trabalho_centavos, df_resumo_id_centavos = resultado
 
-    # Aplicando o filtro **apenas** na coluna "Valor Analisado" (≤ 0,01)
-    df_trabalho_centavos = data[data["Valor Analisado"].notna() & (data["Valor Analisado"] <= 0.01)].copy()
+    # Criando a nova coluna "Valor Analisado"
+    df_trabalho_centavos["Valor Analisado"] = df_trabalho_centavos["Valor"]
 
     if df_trabalho_centavos.empty:
         st.info("Nenhum bem encontrado com valor analisado igual ou inferior a R$ 0,01.")
         return
 
     st.markdown("##### Detalhamento por Unidade")
-    df_resumo_id_centavos = df_trabalho_centavos.groupby("Id", as_index=False).agg(
-        Quantidade_Bens_Centavos=("Tombamento", "count"), 
-        _Soma_Valor_Analisado_Numerico=("Valor Analisado", "sum"),
-        _Soma_Valor_Contabil_Numerico=("Valor Contabil", "sum")
-    ).sort_values("_Soma_Valor_Analisado_Numerico", ascending=True)
     
     df_resumo_id_centavos["Valor Analisado Total (R$)"] = df_resumo_id_centavos["_Soma_Valor_Analisado_Numerico"].apply(format_currency)
     df_resumo_id_centavos["Valor Contábil Total Residual (R$)"] = df_resumo_id_centavos["_Soma_Valor_Contabil_Numerico"].apply(format_currency)
@@ -739,8 +1306,8 @@ def exibir_aba_centavos():
         
     ids_unicos_com_centavos = df_trabalho_centavos["Id"].nunique()
     quantidade_total_bens_centavos = len(df_trabalho_centavos)
-    soma_total_valor_analisado_centavos = df_trabalho_centavos["Valor Analisado"].dropna().sum()
-    soma_total_valor_contabil_centavos = df_trabalho_centavos["Valor Contabil"].dropna().sum()
+    soma_total_valor_analisado_centavos = df_trabalho_centavos["Valor Analisado"].sum()
+    soma_total_valor_contabil_centavos = df_trabalho_centavos["Valor Contabil"].sum()
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Unidades (Id) Distintas com Itens Residuais", f"{ids_unicos_com_centavos}")
@@ -748,12 +1315,22 @@ def exibir_aba_centavos():
     col3.metric("Valor Analisado Total dos Itens Residuais (R$)", format_currency(soma_total_valor_analisado_centavos))
     col4.metric("Valor Contábil Total dos Itens Residuais (R$)", format_currency(soma_total_valor_contabil_centavos))
 
+# ============================
+# FUNÇÃO: Calcular Resumo por Conta SIAFI
+# ============================
+def calcular_resumo_siafi(data, col_para_contagem):
+    return agregar_por(data, "Conta SIAFI", {
+        "Total_Itens": (col_para_contagem, "count"),
+        "_Soma_Valor_Numerico": ("Valor", "sum"),
+        "_Soma_Valor_Contabil_Numerico": ("Valor Contabil", "sum")
+    })
+
 # ============================
 # ABA: Resumo por Conta SIAFI
 # ============================
 def exibir_aba_siafi():
     st.subheader("📊 Conta SIAFI")
-    data_original = load_data()
+    data_original = carregar_base()
     if data_original is None:
         return
 
@@ -773,11 +1350,11 @@ def exibir_aba_siafi():
         st.warning(f"Colunas essenciais não encontradas para gerar o resumo por Conta SIAFI: {', '.join(missing_cols)}.")
         return
         
-    df_resumo_siafi = data.groupby("Conta SIAFI", as_index=False).agg(
-        Total_Itens=(col_para_contagem, "count"),
-        _Soma_Valor_Numerico=("Valor", "sum"),
-        _Soma_Valor_Contabil_Numerico=("Valor Contabil", "sum")
+    df_resumo_siafi = calcular_em_segundo_plano(
+        f"resumo_siafi:{col_para_contagem}", calcular_resumo_siafi, data, col_para_contagem
     )
+    if df_resumo_siafi is None:
+        return
 
     if df_resumo_siafi.empty:
         st.info("Nenhum dado encontrado para agrupar por Conta SIAFI.")
@@ -817,10 +1394,505 @@ def exibir_aba_siafi():
     col3.metric("Soma Total Geral de Aquisição (R$)", format_currency(soma_geral_valor))
     col4.metric("Soma Total Geral Contábil (R$)", format_currency(soma_geral_valor_contabil))
 
+# ============================
+# FUNÇÃO AUXILIAR: Normalizar Descrição do Bem
+# ============================
+def normalizar_descricao(series_descricao):
+    # Normaliza apenas as descrições distintas e depois espalha pelos registros (as descrições se repetem muito)
+    codigos, descricoes_unicas = pd.factorize(series_descricao.astype("string"))
+    texto = pd.Series(descricoes_unicas, dtype="string").str.lower()
+    texto = texto.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    texto = texto.str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+    # Ordena os termos para que "MESA ESCRITORIO" e "Escritório, mesa" gerem a mesma chave
+    texto = texto.map(lambda t: " ".join(sorted(set(t.split()))), na_action="ignore")
+    normalizadas = texto.to_numpy(dtype=object, na_value="")
+    resultado = pd.Series("", index=series_descricao.index, dtype="object")
+    validos = codigos >= 0
+    resultado[validos] = normalizadas[codigos[validos]]
+    return resultado
+
+# ============================
+# FUNÇÃO AUXILIAR: Listar Unidades Envolvidas em cada grupo
+# ============================
+def listar_unidades(df, coluna_grupo):
+    pares = df[[coluna_grupo, "Unidade"]].drop_duplicates().sort_values([coluna_grupo, "Unidade"])
+    return pares.groupby(coluna_grupo, sort=False)["Unidade"].agg(", ".join)
+
+# ============================
+# FUNÇÃO: Calcular Duplicidades
+# ============================
+DUPLICIDADES_COLUNAS = ["Id", "Tombamento", "Bem Móvel", "Valor", "Valor Contabil", "Data de Ingresso"]
+
+def calcular_duplicidades(data):
+    colunas_base = [col for col in DUPLICIDADES_COLUNAS if col in data.columns]
+    df = data[colunas_base].copy()
+    df["Unidade"] = df["Id"].astype(str)
+
+    # 1. Duplicidade exata: o mesmo Tombamento em mais de um registro (índice hash do groupby)
+    reportar_progresso(0.1, "Verificando Tombamentos repetidos")
+    df_tomb = df[df["Tombamento"].notna()]
+    df_tomb = df_tomb[df_tomb["Tombamento"].duplicated(keep=False)].copy()
+    grupos_tomb = df_tomb.groupby("Tombamento")["Unidade"]
+    df_tomb["Qtd. Ocorrências"] = grupos_tomb.transform("size")
+    df_tomb["Qtd. Unidades"] = grupos_tomb.transform("nunique")
+    df_tomb["Unidades Envolvidas"] = df_tomb["Tombamento"].map(listar_unidades(df_tomb, "Tombamento"))
+    df_tomb["_Entre_Unidades"] = df_tomb["Qtd. Unidades"].gt(1)
+    df_tomb["Tipo"] = df_tomb["_Entre_Unidades"].map({True: "Entre unidades", False: "Na mesma unidade"})
+    df_tomb.sort_values(["Tombamento", "Unidade"], inplace=True)
+
+    # 2. Quase duplicidade: chave de bloqueio (descrição normalizada + Valor + Data de Ingresso).
+    #    Só registros do mesmo bloco são comparados, e o bloco suspeito é aquele que aparece em mais
+    #    de uma unidade com Tombamentos diferentes, evitando a comparação de todos os pares.
+    #    Blocos dentro de uma única unidade não são apontados: costumam ser itens do mesmo lote.
+    reportar_progresso(0.4, "Procurando bens quase duplicados")
+    df_quase = pd.DataFrame(columns=df.columns)
+    if "Bem Móvel" in df.columns and "Valor" in df.columns:
+        chaves = ["_Descricao_Normalizada", "_Valor_Centavos"]
+        df["_Descricao_Normalizada"] = normalizar_descricao(df["Bem Móvel"])
+        df["_Valor_Centavos"] = df["Valor"].mul(100).round()
+        if "Data de Ingresso" in df.columns:
+            chaves.append("Data de Ingresso")
+        candidatos = df[df["_Descricao_Normalizada"].ne("") & df["_Valor_Centavos"].notna()]
+        grupos_bloco = candidatos.groupby(chaves, dropna=False, sort=False)
+        qtd_unidades = grupos_bloco["Unidade"].transform("nunique")
+        # Tombamento vazio conta como distinto de todos os outros
+        tombamentos = candidatos["Tombamento"].fillna(pd.Series(-np.arange(1.0, len(candidatos) + 1), index=candidatos.index))
+        qtd_tombamentos = tombamentos.groupby([candidatos[c] for c in chaves], dropna=False, sort=False).transform("nunique")
+        df_quase = candidatos[(qtd_unidades > 1) & (qtd_tombamentos > 1)].copy()
+        if not df_quase.empty:
+            grupos_quase = df_quase.groupby(chaves, dropna=False, sort=False)
+            df_quase["Grupo"] = grupos_quase.ngroup() + 1
+            df_quase["Qtd. Unidades"] = grupos_quase["Unidade"].transform("nunique")
+            df_quase["Unidades Envolvidas"] = df_quase["Grupo"].map(listar_unidades(df_quase, "Grupo"))
+            df_quase.sort_values(["Grupo", "Unidade"], inplace=True)
+    # Registros que já aparecem com Tombamento repetido não são contados de novo no resumo
+    df_quase["_Tombamento_Repetido"] = df_quase.index.isin(df_tomb.index)
+
+    # 3. Relatório de conflitos por unidade
+    reportar_progresso(0.9, "Consolidando conflitos por unidade")
+    df_tomb["_Mesma_Unidade"] = ~df_tomb["_Entre_Unidades"]
+    resumo_tomb = df_tomb.groupby("Unidade").agg(
+        Tombamento_Entre_Unidades=("_Entre_Unidades", "sum"),
+        Tombamento_Mesma_Unidade=("_Mesma_Unidade", "sum"),
+        _Valor_Tombamento_Numerico=("Valor", "sum"),
+    )
+    resumo_quase = df_quase[~df_quase["_Tombamento_Repetido"]].groupby("Unidade").agg(
+        Quase_Duplicados=("Unidade", "size"),
+        _Valor_Quase_Numerico=("Valor", "sum"),
+    )
+    df_resumo = resumo_tomb.join(resumo_quase, how="outer").fillna(0).reset_index()
+    for col in ["Tombamento_Entre_Unidades", "Tombamento_Mesma_Unidade", "Quase_Duplicados"]:
+        df_resumo[col] = df_resumo[col].astype(int)
+    df_resumo["_Total_Conflitos"] = df_resumo[["Tombamento_Entre_Unidades", "Tombamento_Mesma_Unidade", "Quase_Duplicados"]].sum(axis=1)
+    df_resumo.sort_values("_Total_Conflitos", ascending=False, inplace=True)
+
+    return df_resumo, df_tomb, df_quase
+
+def calcular_duplicidades_da_base(data):
+    if MODO_BLOCOS:
+        # A comparação entre unidades precisa de todos os registros: lê só as colunas usadas,
+        # dentro da tarefa, para que a leitura aconteça uma única vez por versão dos dados
+        reportar_progresso(0.05, "Lendo colunas do snapshot")
+        data = carregar_colunas([col for col in DUPLICIDADES_COLUNAS if col in data.columns])
+    return calcular_duplicidades(data)
+
+# ============================
+# ABA: Duplicidades
+# ============================
+def exibir_duplicidades():
+    st.subheader("🧬 Duplicidades entre Unidades")
+    st.caption("Tombamentos repetidos são apontados entre unidades e dentro da mesma unidade. Bens quase duplicados "
+               "(mesma descrição normalizada, valor e data de ingresso, com Tombamentos diferentes) são apontados apenas "
+               "entre unidades, pois bens idênticos na mesma unidade costumam ser itens de um mesmo lote de aquisição.")
+    data = carregar_base()
+    if data is None:
+        return
+
+    required_cols = ["Id", "Tombamento", "Bem Móvel", "Valor", "Valor Contabil"]
+    if not all(col in data.columns for col in required_cols):
+        missing = [col for col in required_cols if col not in data.columns]
+        st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar a análise de duplicidades.")
+        return
+
+    resultado = calcular_em_segundo_plano("duplicidades", calcular_duplicidades_da_base, data)
+    if resultado is None:
+        return
+    df_resumo, df_tomb, df_quase = resultado
+
+    if df_resumo.empty:
+        st.info("Nenhum Tombamento repetido ou bem quase duplicado encontrado.")
+        return
+
+    st.markdown("##### Resumo Geral")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Tombamentos Repetidos", f"{df_tomb['Tombamento'].nunique():,}".replace(",", "."))
+    col2.metric("Registros com Tombamento Repetido", f"{len(df_tomb):,}".replace(",", "."))
+    col3.metric("Registros Quase Duplicados", f"{(~df_quase['_Tombamento_Repetido']).sum():,}".replace(",", "."),
+                help="Sem contar os registros que já aparecem com Tombamento repetido")
+
+    st.markdown("---")
+    st.markdown("##### Conflitos por Unidade")
+    df_resumo["Valor Tombamento Repetido (R$)"] = df_resumo["_Valor_Tombamento_Numerico"].apply(format_currency)
+    df_resumo["Valor Quase Duplicado (R$)"] = df_resumo["_Valor_Quase_Numerico"].apply(format_currency)
+    st.dataframe(
+        df_resumo[["Unidade", "Tombamento_Entre_Unidades", "Tombamento_Mesma_Unidade", "Valor Tombamento Repetido (R$)",
+                   "Quase_Duplicados", "Valor Quase Duplicado (R$)"]],
+        column_config={
+            "Unidade": st.column_config.TextColumn("Unidade (Id)", help="Identificador da Unidade"),
+            "Tombamento_Entre_Unidades": st.column_config.TextColumn("Tombamento em Outra Unidade", help="Registros cujo Tombamento também foi informado por outra unidade"),
+            "Tombamento_Mesma_Unidade": st.column_config.TextColumn("Tombamento Repetido na Unidade", help="Registros cujo Tombamento aparece mais de uma vez na própria unidade"),
+            "Valor Tombamento Repetido (R$)": st.column_config.TextColumn("Valor Tombamento Repetido (R$)"),
+            "Quase_Duplicados": st.column_config.TextColumn("Quase Duplicados", help="Mesma descrição normalizada, Valor e Data de Ingresso em outra unidade, com outro Tombamento"),
+            "Valor Quase Duplicado (R$)": st.column_config.TextColumn("Valor Quase Duplicado (R$)"),
+        },
+        height=400,
+        use_container_width=True
+    )
+
+    with st.expander(f"Visualizar {len(df_tomb)} Registros com Tombamento Repetido", expanded=False):
+        df_tomb["Valor Analisado Formatado"] = df_tomb["Valor"].apply(format_currency)
+        df_tomb["Valor Contabil Formatado"] = df_tomb["Valor Contabil"].apply(format_currency)
+        st.dataframe(
+            df_tomb[["Tombamento", "Unidade", "Bem Móvel", "Valor Analisado Formatado", "Valor Contabil Formatado", "Tipo", "Unidades Envolvidas"]],
+            column_config={
+                "Tombamento": st.column_config.NumberColumn("Nº Tombamento", format="%d"),
+                "Unidade": "Unidade (Id)",
+                "Bem Móvel": "Descrição do Bem",
+                "Valor Analisado Formatado": st.column_config.TextColumn("Valor Analisado (R$)"),
+                "Valor Contabil Formatado": st.column_config.TextColumn("Valor Contábil (R$)"),
+            },
+            height=400,
+            use_container_width=True
+        )
+
+    with st.expander(f"Visualizar {len(df_quase)} Registros Quase Duplicados", expanded=False):
+        if df_quase.empty:
+            st.info("Nenhum bem com mesma descrição, valor e data de ingresso em unidades diferentes.")
+        else:
+            df_quase["Valor Analisado Formatado"] = df_quase["Valor"].apply(format_currency)
+            if "Data de Ingresso" in df_quase.columns:
+                df_quase["Data de Ingresso Formatada"] = format_date_for_display(df_quase["Data de Ingresso"])
+            else:
+                df_quase["Data de Ingresso Formatada"] = "N/A"
+            st.dataframe(
+                df_quase[["Grupo", "Unidade", "Tombamento", "Bem Móvel", "Valor Analisado Formatado", "Data de Ingresso Formatada", "Unidades Envolvidas"]],
+                column_config={
+                    "Grupo": st.column_config.NumberColumn("Grupo", help="Registros do mesmo grupo compartilham descrição normalizada, valor e data"),
+                    "Unidade": "Unidade (Id)",
+                    "Tombamento": st.column_config.NumberColumn("Nº Tombamento", format="%d"),
+                    "Bem Móvel": "Descrição do Bem",
+                    "Valor Analisado Formatado": st.column_config.TextColumn("Valor Analisado (R$)"),
+                    "Data de Ingresso Formatada": st.column_config.TextColumn("Data de Ingresso"),
+                },
+                height=400,
+                use_container_width=True
+            )
+
+# ============================
+# HIERARQUIA DE UNIDADES E CUBO DE AGREGADOS
+# ============================
+# A hierarquia é configurada em um CSV (separador "," ou ";") com a coluna "Id" e uma coluna
+# por nível, da mais específica para a mais ampla, por exemplo:
+#
+#     Id;Diretoria;Campus
+#     PROAES;Pró-Reitorias;Niterói - Valonguinho
+#
+# O cubo soma Quantidade, Valor e Valor Contabil por todos os níveis da hierarquia × Id ×
+# Conta SIAFI × Status × Ano de Ingresso em uma única passada agrupada, e é gravado ao lado do
+# snapshot para cada versão dos dados e da hierarquia. Qualquer consolidação ou tabela
+# dinâmica é então calculada sobre o cubo, sem novo groupby nos registros.
+ARQUIVO_HIERARQUIA = os.environ.get("SISAP_HIERARQUIA", "hierarquia_unidades.csv")
+SEM_HIERARQUIA = "Não mapeado"
+DIMENSOES_CUBO = ["Id", "Conta SIAFI", "Status", "Ano de Ingresso"]
+MEDIDAS_CUBO = {
+    "Quantidade": ("Id", "size"),
+    "Valor": ("Valor", "sum"),
+    "Valor Contabil": ("Valor Contabil", "sum"),
+}
+
+def carregar_hierarquia(caminho=ARQUIVO_HIERARQUIA):
+    # Retorna None quando não há hierarquia configurada
+    if not os.path.exists(caminho):
+        return None
+    hierarquia = pd.read_csv(caminho, sep=None, engine="python", dtype=str, encoding="utf-8-sig")
+    hierarquia.columns = [col.strip() for col in hierarquia.columns]
+    if "Id" not in hierarquia.columns:
+        raise ValueError(f"O arquivo de hierarquia '{caminho}' precisa da coluna 'Id'.")
+    hierarquia = hierarquia.apply(lambda col: col.str.strip())
+    return hierarquia.drop_duplicates(subset=["Id"], keep="last").set_index("Id")
+
+def assinatura_hierarquia(caminho=ARQUIVO_HIERARQUIA):
+    if not os.path.exists(caminho):
+        return "sem-hierarquia"
+    with open(caminho, "rb") as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()[:8]
+
+def caminho_cubo(versao=None, assinatura=None):
+    return os.path.join(PASTA_SNAPSHOTS, f"sisap_{versao or versao_dados()}.cubo_{assinatura or assinatura_hierarquia()}.parquet")
+
+def preparar_dimensoes(d, hierarquia):
+    d = d.copy()
+    unidades = d["Id"].astype("string").str.strip()
+    niveis = [] if hierarquia is None else list(hierarquia.columns)
+    for nivel in niveis:
+        d[nivel] = unidades.map(hierarquia[nivel]).fillna(SEM_HIERARQUIA).astype(str)
+    d["Status"] = d["Status"].astype("string").fillna("Não informado").astype(str) if "Status" in d.columns else "Não informado"
+    if "Data de Ingresso" in d.columns:
+        d["Ano de Ingresso"] = d["Data de Ingresso"].dt.year.astype("Int64")
+    else:
+        d["Ano de Ingresso"] = pd.Series(pd.NA, index=d.index, dtype="Int64")
+    return d
+
+def calcular_cubo(data):
+    hierarquia = carregar_hierarquia()
+    niveis = [] if hierarquia is None else list(hierarquia.columns)
+    # O cubo é gravado com a versão dos dados de que foi de fato calculado
+    versao = data.attrs.get("versao") or versao_dados()
+    destino = caminho_cubo(versao)
+    total_registros = pq.ParquetFile(gerar_snapshot()).metadata.num_rows if MODO_BLOCOS else len(data)
+    with obter_lock(destino):
+        if os.path.exists(destino):
+            cubo = pd.read_parquet(destino)
+            # Um cubo que não soma todos os registros da base foi gravado a partir de outros dados
+            if cubo["Quantidade"].sum() == total_registros:
+                return cubo, niveis
+
+        reportar_progresso(0.1, "Agrupando registros")
+        cubo = agregar_por(data, niveis + DIMENSOES_CUBO, MEDIDAS_CUBO,
+                           filtro=lambda d: preparar_dimensoes(d, hierarquia), dropna=False)
+        cubo["Quantidade"] = cubo["Quantidade"].astype("int64")
+        if versao_dados() != versao:
+            # A planilha mudou durante o cálculo (em modo blocos os blocos lidos podem ser da
+            # versão nova): o resultado vale para esta execução, mas não é gravado
+            return cubo, niveis
+        try:
+            os.makedirs(PASTA_SNAPSHOTS, exist_ok=True)
+            temporario = caminho_temporario(destino)
+            cubo.to_parquet(temporario, index=False)
+            os.replace(temporario, destino)
+        except OSError:
+            # Sem permissão de escrita o cubo continua valendo para esta execução
+            pass
+    return cubo, niveis
+
+def consolidar_cubo(cubo, dimensoes):
+    if not dimensoes:
+        return cubo[list(MEDIDAS_CUBO)].sum().to_frame().T.astype({"Quantidade": "int64"})
+    return cubo.groupby(dimensoes, as_index=False, dropna=False)[list(MEDIDAS_CUBO)].sum()
+
+# ============================
+# ABA: Consolidação (Hierarquia de Unidades)
+# ============================
+def exibir_consolidacao():
+    st.subheader("🗂️ Consolidação por Hierarquia de Unidades")
+    data = carregar_base()
+    if data is None:
+        return
+
+    required_cols = ["Id", "Valor", "Valor Contabil"]
+    if not all(col in data.columns for col in required_cols):
+        missing = [col for col in required_cols if col not in data.columns]
+        st.warning(f"Colunas necessárias não encontradas: {', '.join(missing)}. Não é possível gerar a consolidação.")
+        return
+
+    try:
+        assinatura = assinatura_hierarquia()
+    except OSError as e:
+        st.error(f"Erro ao ler o arquivo de hierarquia '{ARQUIVO_HIERARQUIA}': {e}")
+        return
+    resultado = calcular_em_segundo_plano(f"cubo:{assinatura}", calcular_cubo, data)
+    if resultado is None:
+        return
+    cubo, niveis = resultado
+
+    if not niveis:
+        st.info(f"Nenhuma hierarquia configurada. Crie o arquivo '{ARQUIVO_HIERARQUIA}' com a coluna 'Id' e uma coluna por nível (ex.: Diretoria, Campus) para consolidar as unidades.")
+    else:
+        nao_mapeadas = cubo.loc[cubo[niveis[0]] == SEM_HIERARQUIA, "Id"].nunique()
+        if nao_mapeadas:
+            st.warning(f"{nao_mapeadas} unidade(s) sem correspondência no arquivo de hierarquia aparecem como '{SEM_HIERARQUIA}'.")
+
+    dimensoes_disponiveis = niveis + DIMENSOES_CUBO
+    st.markdown("##### Totais Consolidados")
+    dimensoes = st.multiselect(
+        "Agrupar por", dimensoes_disponiveis,
+        default=[niveis[-1]] if niveis else ["Conta SIAFI"],
+        key="consolidacao_dimensoes"
+    )
+    df_consolidado = consolidar_cubo(cubo, dimensoes).sort_values("Valor", ascending=False)
+    df_consolidado["Valor Analisado (R$)"] = df_consolidado["Valor"].apply(format_currency)
+    df_consolidado["Valor Contábil Analisado (R$)"] = df_consolidado["Valor Contabil"].apply(format_currency)
+    df_consolidado["Total de Bens"] = df_consolidado["Quantidade"].apply(lambda x: f"{int(x):,}".replace(",", "."))
+    st.dataframe(
+        df_consolidado[dimensoes + ["Total de Bens", "Valor Analisado (R$)", "Valor Contábil Analisado (R$)"]],
+        column_config={
+            "Id": st.column_config.TextColumn("Unidade (Id)"),
+            "Conta SIAFI": st.column_config.NumberColumn("Conta SIAFI", format="%d"),
+            "Ano de Ingresso": st.column_config.NumberColumn("Ano de Ingresso", format="%d"),
+        },
+        hide_index=True, height=400, use_container_width=True
+    )
+
+    st.markdown("---")
+    st.markdown("##### Tabela Dinâmica")
+    col1, col2, col3 = st.columns(3)
+    linha = col1.selectbox("Linhas", dimensoes_disponiveis, index=0, key="consolidacao_linhas")
+    coluna = col2.selectbox("Colunas", [d for d in dimensoes_disponiveis if d != linha],
+                            index=0, key="consolidacao_colunas")
+    medida = col3.selectbox("Medida", list(MEDIDAS_CUBO), index=1, key="consolidacao_medida")
+    df_dinamica = consolidar_cubo(cubo, [linha, coluna]).pivot_table(
+        index=linha, columns=coluna, values=medida, aggfunc="sum", fill_value=0, dropna=False
+    )
+    if medida == "Quantidade":
+        df_dinamica = df_dinamica.astype(int)
+    st.dataframe(df_dinamica, height=400, use_container_width=True)
+
+# ============================
+# ABA: Qualidade dos Dados
+# ============================
+def exibir_qualidade_dados():
+    st.subheader("🧪 Qualidade dos Dados")
+    if carregar_base() is None:
+        return
+    relatorio = carregar_validacao()
+    if relatorio is None:
+        falha = _falhas_validacao.get(versao_dados())
+        if falha is not None:
+            st.warning(f"A validação dos dados falhou nesta carga; as demais abas usam os dados normalmente. Erro: {falha}")
+        else:
+            st.info("Relatório de validação indisponível para a versão atual dos dados.")
+        return
+
+    total_registros = relatorio["total_registros"]
+    verificacoes = relatorio["verificacoes"]
+    falhas_conversao = sum(v["falhas"] for v in verificacoes.values() if v["tipo"] == "Conversão")
+    fora_da_faixa = sum(v["falhas"] for v in verificacoes.values() if v["tipo"] == "Fora da faixa")
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Registros Validados", f"{total_registros:,}".replace(",", "."))
+    col2.metric("Colunas Ausentes", f"{len(relatorio['esquema']['colunas_ausentes'])}")
+    col3.metric("Valores Não Convertidos", f"{falhas_conversao:,}".replace(",", "."))
+    col4.metric("Valores Fora da Faixa", f"{fora_da_faixa:,}".replace(",", "."))
+
+    if relatorio["esquema"]["colunas_ausentes"]:
+        st.warning(f"Colunas esperadas não encontradas na planilha: {', '.join(relatorio['esquema']['colunas_ausentes'])}.")
+
+    st.markdown("---")
+    st.markdown("##### Verificações por Coluna")
+    df_verificacoes = pd.DataFrame([
+        {"Verificação": nome, "Tipo": v["tipo"], "Coluna": v["coluna"], "Registros": v["falhas"]}
+        for nome, v in verificacoes.items()
+    ])
+    df_verificacoes["% da Base"] = (df_verificacoes["Registros"] / max(total_registros, 1) * 100).map(
+        lambda x: f"{x:.2f}%".replace(".", ",")
+    )
+    st.dataframe(df_verificacoes, hide_index=True, use_container_width=True)
+
+    st.markdown("##### Ocorrências por Unidade")
+    df_por_unidade = pd.DataFrame({nome: v["por_unidade"] for nome, v in verificacoes.items() if v["falhas"] > 0})
+    if df_por_unidade.empty:
+        st.info("Nenhuma ocorrência encontrada.")
+        return
+    df_por_unidade = df_por_unidade.fillna(0).astype(int)
+    df_por_unidade = df_por_unidade.loc[df_por_unidade.sum(axis=1).sort_values(ascending=False).index]
+    df_por_unidade.index.name = "Unidade (Id)"
+    st.dataframe(df_por_unidade, height=400, use_container_width=True)
+
+    with st.expander("Visualizar Linhas da Planilha com Ocorrências", expanded=False):
+        nomes = [nome for nome, v in verificacoes.items() if v["falhas"] > 0]
+        escolhida = st.selectbox("Verificação", nomes)
+        linhas = verificacoes[escolhida]["linhas"]
+        st.caption(f"{len(linhas)} linhas (numeração da planilha, com o cabeçalho na linha 1).")
+        st.dataframe(pd.DataFrame({"Linha da Planilha": linhas[:5000]}), hide_index=True, height=300)
+
+# ============================
+# FUNÇÃO: Gerar Relatórios (resultados de todas as abas, sem formatação)
+# ============================
+# Usada pela publicação estática (publicar.py). Cada relatório é um DataFrame com valores
+# numéricos; relatórios cujas colunas não existem na base são omitidos.
+COLUNAS_DETALHE = ["Id", "Tombamento", "Bem Móvel", "Conta SIAFI", "Valor", "Valor Contabil", "Status", "Data de Ingresso"]
+
+def gerar_relatorios(data):
+    colunas = set(data.columns)
+    detalhe = lambda df: df[[col for col in COLUNAS_DETALHE if col in df.columns]].reset_index(drop=True)
+    relatorios = {}
+
+    if {"Id", "Valor", "Valor Contabil"} <= colunas:
+        reportar_progresso(0.1, "Carga Patrimonial")
+        relatorios["carga_patrimonial"] = calcular_carga_patrimonial(data).rename(columns={
+            "_Valor_Numerico": "Valor", "_Valor_Contabil_Numerico": "Valor Contabil"
+        })[["Id", "Total de Bens", "Valor", "Valor Contabil"]].reset_index(drop=True)
+
+    if {"Id", "Valor", "Valor Contabil", "Tombamento", "Bem Móvel", "Conta SIAFI", "Status"} <= colunas:
+        reportar_progresso(0.25, "Bens de Alto Valor")
+        df_top3 = calcular_top3_por_unidade(data)
+        relatorios["bens_alto_valor"] = detalhe(df_top3.dropna(subset=["Valor"]))
+        relatorios["top10_institucional"] = detalhe(calcular_top10_institucional(data).dropna(subset=["Valor"]))
+        status_regular = df_top3["Status"].eq("Regular").fillna(False).astype(bool)
+        df_regular = df_top3[status_regular]
+        df_diversos = df_top3[~status_regular]
+        relatorios["bens_por_status"] = pd.DataFrame({
+            "Status": ["Regular", "Diversos"],
+            "Quantidade": [len(df_regular), len(df_diversos)],
+            "Valor": [df_regular["Valor"].sum(), df_diversos["Valor"].sum()],
+            "Valor Contabil": [df_regular["Valor Contabil"].sum(), df_diversos["Valor Contabil"].sum()],
+        })
+
+    if {"Id", "Valor", "Valor Contabil", "Tombamento", "Bem Móvel", "Conta SIAFI"} <= colunas:
+        reportar_progresso(0.45, "Valores e Datas Discrepantes")
+        relatorios["valor_discrepante"] = detalhe(calcular_valor_discrepante(data))
+        if "Data de Ingresso" in colunas:
+            relatorios["data_discrepante"] = detalhe(calcular_data_discrepante(data))
+
+        reportar_progresso(0.6, "Conta SIAFI 18 e Centavos")
+        df_siafi18, df_resumo_siafi18 = calcular_conta_siafi_18(data)
+        relatorios["conta_siafi_18"] = df_resumo_siafi18.rename(columns={
+            "Quantidade_Bens_Siafi18": "Quantidade",
+            "_Soma_Valor_Analisado_Numerico": "Valor",
+            "_Soma_Valor_Contabil_Siafi18_Numerico": "Valor Contabil",
+        }).reset_index(drop=True)
+        relatorios["conta_siafi_18_detalhe"] = detalhe(df_siafi18)
+        df_centavos, df_resumo_centavos = calcular_centavos(data)
+        relatorios["centavos"] = df_resumo_centavos.rename(columns={
+            "Quantidade_Bens_Centavos": "Quantidade",
+            "_Soma_Valor_Analisado_Numerico": "Valor",
+            "_Soma_Valor_Contabil_Numerico": "Valor Contabil",
+        }).reset_index(drop=True)
+        relatorios["centavos_detalhe"] = detalhe(df_centavos.sort_values(by=["Id", "Valor", "Tombamento"]))
+
+    if {"Conta SIAFI", "Valor", "Valor Contabil", "Id"} <= colunas:
+        reportar_progresso(0.75, "Conta SIAFI")
+        relatorios["conta_siafi"] = calcular_resumo_siafi(data, "Id").rename(columns={
+            "Total_Itens": "Total de Itens",
+            "_Soma_Valor_Numerico": "Valor",
+            "_Soma_Valor_Contabil_Numerico": "Valor Contabil",
+        }).sort_values("Conta SIAFI").reset_index(drop=True)
+
+    if {"Id", "Tombamento", "Bem Móvel", "Valor", "Valor Contabil"} <= colunas:
+        reportar_progresso(0.85, "Duplicidades")
+        df_resumo, _, _ = calcular_duplicidades_da_base(data)
+        relatorios["duplicidades"] = df_resumo.rename(columns={
+            "Tombamento_Entre_Unidades": "Tombamento em Outra Unidade",
+            "Tombamento_Mesma_Unidade": "Tombamento Repetido na Unidade",
+            "_Valor_Tombamento_Numerico": "Valor Tombamento Repetido",
+            "Quase_Duplicados": "Quase Duplicados",
+            "_Valor_Quase_Numerico": "Valor Quase Duplicado",
+            "_Total_Conflitos": "Total de Conflitos",
+        }).reset_index(drop=True)
+
+    return relatorios
+
 # ============================
 # FUNÇÃO PRINCIPAL
 # ============================
 def main():
+    # Configuração da página feita aqui (e não na importação) para que publicar.py possa importar este módulo
+    st.set_page_config(
+        page_title="SISAP - Análise Patrimonial",
+        page_icon="🏛️",
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
     load_custom_css()
     st.markdown("""<div class="custom-header"><h1>🏛️ UFF - Comissão de Processamento de Inventário</h1></div>""", unsafe_allow_html=True)
 
@@ -828,12 +1900,14 @@ def main():
     tabs_names = [
         "Apresentação", "Carga Patrimonial", "Bens de Alto Valor", 
         "Top 10 Institucional", "Valor Discrepante", "Data Discrepante",
-        "Conta Siafi 18 - Livros", "Centavos", "Conta SIAFI", "Bens"
+        "Conta Siafi 18 - Livros", "Centavos", "Conta SIAFI", "Bens", "Duplicidades",
+        "Consolidação", "Qualidade dos Dados"
     ]
     tab_functions = [
         exibir_apresentacao, exibir_carga_patrimonial, exibir_bens_alto_valor,
         exibir_top_10, exibir_valor_discrepante, exibir_data_discrepante,
-        exibir_conta_siafi_18, exibir_aba_centavos, exibir_aba_siafi, exibir_aba_bens
+        exibir_conta_siafi_18, exibir_aba_centavos, exibir_aba_siafi, exibir_aba_bens,
+        exibir_duplicidades, exibir_consolidacao, exibir_qualidade_dados
     ]
     
     tabs = st.tabs(tabs_names)
@@ -0,0 +1,223 @@
+# --- Publicação estática dos relatórios do SISAP ---
+#
+# Gera, para a versão atual dos dados, um pacote HTML somente leitura com todas as abas já
+# calculadas (tabelas, gráficos Vega-Lite e arquivos JSON com os dados). Quem apenas consulta
+# os números abre o HTML sem nenhum processamento no servidor; o app Streamlit fica para os
+# auditores que precisam da análise interativa.
+#
+# Uso:  python publicar.py [--destino publicado]
+
+import argparse
+import html
+import json
+import os
+import sys
+
+import altair as alt
+import pandas as pd
+
+import espelhamento as esp
+
+LIMITE_LINHAS_HTML = 1000 # listas maiores ficam completas apenas no JSON
+
+# ============================
+# Títulos e colunas de cada relatório (mesmos rótulos das abas do app)
+# ============================
+RELATORIOS = [
+    ("carga_patrimonial", "📊 Carga Patrimonial por Unidade"),
+    ("bens_alto_valor", "💎 Ativos de Alto Valor por Unidade"),
+    ("top10_institucional", "🏆 Top 10 Bens de Alto Valor Institucional"),
+    ("valor_discrepante", "📝 Bens com Valor Contábil Superior ao Valor de Aquisição"),
+    ("data_discrepante", "📅 Data de Ingresso Discrepante"),
+    ("conta_siafi_18", "📚 Conta SIAFI 18 - Livros e Documentos"),
+    ("conta_siafi_18_detalhe", "📚 Conta SIAFI 18 - Detalhamento dos Bens"),
+    ("centavos", "🪙 Bens com Valor Residual (Centavos)"),
+    ("centavos_detalhe", "🪙 Bens com Valor Residual - Detalhamento"),
+    ("conta_siafi", "📊 Conta SIAFI"),
+    ("bens_por_status", "🔎 Bens de Maior Valor: Visão por Status"),
+    ("duplicidades", "🧬 Duplicidades entre Unidades"),
+]
+
+ROTULOS = {
+    "Id": "Unidade (Id)",
+    "Tombamento": "Nº Tombamento",
+    "Bem Móvel": "Descrição do Bem",
+    "Conta SIAFI": "Conta Contábil",
+    "Valor": "Valor Analisado (R$)",
+    "Valor Contabil": "Valor Contábil Analisado (R$)",
+    "Data de Ingresso": "Data de Ingresso",
+    "Unidade": "Unidade (Id)",
+    "Valor Tombamento Repetido": "Valor Tombamento Repetido (R$)",
+    "Valor Quase Duplicado": "Valor Quase Duplicado (R$)",
+}
+
+COLUNAS_MOEDA = ["Valor", "Valor Contabil", "Valor Tombamento Repetido", "Valor Quase Duplicado"]
+COLUNAS_INTEIRAS = ["Tombamento", "Conta SIAFI"]
+
+# ============================
+# FUNÇÃO: Formatar tabela para exibição
+# ============================
+def formatar_tabela(df):
+    df = df.copy()
+    for col in df.columns:
+        if col in COLUNAS_MOEDA:
+            df[col] = df[col].apply(esp.format_currency)
+        elif col in COLUNAS_INTEIRAS:
+            df[col] = df[col].apply(lambda x: "N/A" if pd.isna(x) else f"{int(x)}")
+        elif col == "Data de Ingresso":
+            df[col] = esp.format_date_for_display(df[col])
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = df[col].apply(lambda x: f"{x:,}".replace(",", "."))
+    return df.rename(columns=ROTULOS)
+
+# ============================
+# FUNÇÃO: Gráficos (especificações Vega-Lite)
+# ============================
+def gerar_graficos(relatorios):
+    graficos = {}
+    if "carga_patrimonial" in relatorios:
+        top10_unidades = relatorios["carga_patrimonial"].head(10)
+        graficos["carga_patrimonial"] = alt.Chart(top10_unidades).mark_bar().encode(
+            x=alt.X("Valor:Q", title="Valor Analisado (R$)"),
+            y=alt.Y("Id:N", sort=alt.SortField(field="Valor", order="descending"), title="Unidade (Id)"),
+            tooltip=[
+                alt.Tooltip("Id:N", title="Unidade"),
+                alt.Tooltip("Total de Bens:Q", title="Qtd. Bens", format=","),
+                alt.Tooltip("Valor:Q", title="Valor Analisado (R$)", format=",.2f"),
+                alt.Tooltip("Valor Contabil:Q", title="Valor Contábil (R$)", format=",.2f")
+            ]
+        ).properties(title="Top 10 Unidades por Valor Analisado (Aquisição)", width="container", height=400).to_dict()
+    if "bens_alto_valor" in relatorios:
+        df_para_grafico = relatorios["bens_alto_valor"].groupby("Id", as_index=False).agg(
+            Valor=("Valor", "sum")
+        ).nlargest(10, "Valor")
+        graficos["bens_por_status"] = alt.Chart(df_para_grafico).mark_bar().encode(
+            x=alt.X("Valor:Q", title="Valor Analisado Somado (R$)"),
+            y=alt.Y("Id:N", title="Unidade (Id)", sort="-x"),
+            tooltip=[
+                alt.Tooltip("Id:N", title="Unidade"),
+                alt.Tooltip("Valor:Q", title="Soma Valor Analisado (R$)", format="$,.2f")
+            ]
+        ).properties(title="As 10 Unidades com os Maiores Valores de Ingresso", width="container", height=350).to_dict()
+    return graficos
+
+def especificacao_para_script(spec):
+    # "</" escapado para que o conteúdo dos dados não feche a tag <script>
+    return json.dumps(spec, ensure_ascii=False, default=str).replace("</", "<\\/")
+
+# ============================
+# FUNÇÃO: Montar página HTML
+# ============================
+def montar_html(versao, relatorios, graficos):
+    secoes = []
+    navegacao = []
+    for nome, titulo in RELATORIOS:
+        if nome not in relatorios:
+            continue
+        df = relatorios[nome]
+        navegacao.append(f'<a href="#{nome}">{html.escape(titulo)}</a>')
+        partes = [f'<section id="{nome}"><h2>{html.escape(titulo)}</h2>']
+        if nome in graficos:
+            partes.append(f'<div class="grafico" id="grafico-{nome}"></div>')
+        if len(df) > LIMITE_LINHAS_HTML:
+            partes.append(f'<p class="aviso">Exibindo {LIMITE_LINHAS_HTML} de {len(df)} registros. '
+                          f'Lista completa em <a href="dados/{nome}.json">dados/{nome}.json</a>.</p>')
+        else:
+            partes.append(f'<p class="aviso">{len(df)} registros · <a href="dados/{nome}.json">dados/{nome}.json</a></p>')
+        partes.append(formatar_tabela(df.head(LIMITE_LINHAS_HTML)).to_html(index=False, border=0, classes="tabela", na_rep="N/A"))
+        partes.append("</section>")
+        secoes.append("\n".join(partes))
+
+    totais = ""
+    if "carga_patrimonial" in relatorios:
+        carga = relatorios["carga_patrimonial"]
+        total_bens = f"{int(carga['Total de Bens'].sum()):,}".replace(",", ".")
+        totais = (
+            '<div class="metricas">'
+            f'<div><span>Valor Analisado Total (Aquisição)</span><b>{esp.format_currency(carga["Valor"].sum())}</b></div>'
+            f'<div><span>Valor Contábil Total</span><b>{esp.format_currency(carga["Valor Contabil"].sum())}</b></div>'
+            f'<div><span>Quantidade Total de Bens</span><b>{total_bens}</b></div>'
+            '</div>'
+        )
+
+    scripts_graficos = "\n".join(
+        f'vegaEmbed("#grafico-{nome}", {especificacao_para_script(spec)}, {{actions: false}});'
+        for nome, spec in graficos.items()
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>SISAP - Análise Patrimonial (versão {versao})</title>
+<script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+<style>
+body {{ font-family: sans-serif; margin: 0 auto; max-width: 1400px; padding: 0 20px; }}
+.custom-header {{ background-color: #002147; padding: 15px; text-align: center; border-radius: 8px; margin: 20px 0; }}
+.custom-header h1 {{ color: #ffffff; font-size: 26px; font-weight: bold; margin: 0; }}
+nav a {{ display: inline-block; margin: 0 12px 8px 0; color: #002147; }}
+.metricas {{ display: flex; gap: 40px; margin: 20px 0; }}
+.metricas span {{ display: block; color: #555; font-size: 14px; }}
+.metricas b {{ font-size: 28px; }}
+.grafico {{ width: 100%; }}
+.aviso {{ color: #555; font-size: 13px; }}
+.tabela {{ border-collapse: collapse; width: 100%; font-size: 13px; }}
+.tabela th, .tabela td {{ border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: left; }}
+.tabela th {{ background: #f0f2f6; position: sticky; top: 0; }}
+section {{ margin-bottom: 40px; }}
+</style>
+</head>
+<body>
+<div class="custom-header"><h1>🏛️ UFF - Comissão de Processamento de Inventário</h1></div>
+<p class="aviso">Relatório estático gerado para a versão dos dados <b>{versao}</b>. Para análises interativas utilize o aplicativo.</p>
+{totais}
+<nav>{" ".join(navegacao)}</nav>
+{"".join(secoes)}
+<script>
+{scripts_graficos}
+</script>
+</body>
+</html>
+"""
+
+# ============================
+# FUNÇÃO: Publicar
+# ============================
+def publicar(destino):
+    data = esp.carregar_base()
+    if data is None:
+        print(f"Não foi possível carregar os dados de '{esp.ARQUIVO_DADOS}'.", file=sys.stderr)
+        return None
+
+    versao = esp.versao_dados()
+    pasta = os.path.join(destino, versao)
+    os.makedirs(os.path.join(pasta, "dados"), exist_ok=True)
+    os.makedirs(os.path.join(pasta, "graficos"), exist_ok=True)
+
+    relatorios = esp.gerar_relatorios(data)
+    graficos = gerar_graficos(relatorios)
+
+    for nome, df in relatorios.items():
+        df.to_json(os.path.join(pasta, "dados", f"{nome}.json"), orient="records", date_format="iso", force_ascii=False)
+    for nome, spec in graficos.items():
+        with open(os.path.join(pasta, "graficos", f"{nome}.vl.json"), "w", encoding="utf-8") as arquivo:
+            json.dump(spec, arquivo, ensure_ascii=False, default=str)
+    with open(os.path.join(pasta, "index.html"), "w", encoding="utf-8") as arquivo:
+        arquivo.write(montar_html(versao, relatorios, graficos))
+
+    # Página de entrada sempre aponta para a última versão publicada
+    with open(os.path.join(destino, "index.html"), "w", encoding="utf-8") as arquivo:
+        arquivo.write(f'<!DOCTYPE html><meta charset="utf-8"><meta http-equiv="refresh" content="0; url={versao}/index.html">'
+                      f'<a href="{versao}/index.html">SISAP - versão {versao}</a>\n')
+    return pasta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publica os relatórios do SISAP como HTML estático.")
+    parser.add_argument("--destino", default="publicado", help="Pasta onde o pacote será gravado (padrão: publicado)")
+    args = parser.parse_args()
+    pasta = publicar(args.destino)
+    if pasta is None:
+        sys.exit(1)
+    print(f"Relatórios publicados em {os.path.join(pasta, 'index.html')}")
@@ -0,0 +1,132 @@
+# --- Execução do app com vários processos e base em memória compartilhada ---
+#
+# Carrega a base uma única vez (snapshot Parquet gerado em streaming), grava-a como arquivo
+# Arrow IPC em /dev/shm e inicia vários processos do Streamlit que mapeiam esse arquivo
+# somente leitura. As colunas de texto, que são a maior parte da base, ficam nas mesmas
+# páginas de memória para todos os processos, de modo que a memória total praticamente não
+# cresce com o número de processos, e o processamento do pandas se distribui entre os núcleos.
+#
+# Um balanceador TCP simples (round-robin por conexão) recebe os acessos na porta principal
+# e distribui entre os processos; cada sessão do Streamlit usa uma única conexão websocket e
+# portanto permanece no mesmo processo.
+#
+# Uso:  python servir.py [--trabalhadores 4] [--porta 8501]
+
+import argparse
+import asyncio
+import itertools
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import espelhamento as esp
+
+PASTA_MEMORIA_COMPARTILHADA = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# ============================
+# FUNÇÃO: Gravar base em memória compartilhada
+# ============================
+def gerar_arquivo_compartilhado(pasta=PASTA_MEMORIA_COMPARTILHADA):
+    snapshot = esp.gerar_snapshot()
+    destino = os.path.join(pasta, f"sisap_{esp.versao_dados()}.arrow")
+    if os.path.exists(destino):
+        return destino
+    temporario = esp.caminho_temporario(destino)
+    # Conversão por blocos do Parquet para Arrow IPC (sem compressão, para permitir o mapeamento)
+    arquivo = pq.ParquetFile(snapshot)
+    with pa.OSFile(temporario, "wb") as saida:
+        with pa.ipc.new_file(saida, arquivo.schema_arrow) as writer:
+            for lote in arquivo.iter_batches(batch_size=esp.TAMANHO_BLOCO):
+                writer.write_batch(lote)
+    os.replace(temporario, destino)
+    return destino
+
+# ============================
+# FUNÇÃO: Iniciar processos do app
+# ============================
+def iniciar_trabalhadores(arquivo_compartilhado, portas):
+    ambiente = os.environ.copy()
+    ambiente["SISAP_ARQUIVO_COMPARTILHADO"] = arquivo_compartilhado
+    ambiente["SISAP_VERSAO"] = esp.versao_dados()
+    ambiente.pop("SISAP_MODO_BLOCOS", None)
+    # Mesmo segredo em todos os processos, para que os cookies valham em qualquer um deles
+    ambiente.setdefault("STREAMLIT_SERVER_COOKIE_SECRET", secrets.token_hex(32))
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "espelhamento.py")
+    processos = []
+    for porta in portas:
+        processos.append(subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", script,
+            "--server.port", str(porta),
+            "--server.address", "127.0.0.1",
+            "--server.headless", "true",
+        ], env=ambiente))
+    return processos
+
+# ============================
+# Balanceador TCP (round-robin por conexão)
+# ============================
+async def encaminhar(leitor, escritor):
+    try:
+        while True:
+            dados = await leitor.read(64 * 1024)
+            if not dados:
+                break
+            escritor.write(dados)
+            await escritor.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        escritor.close()
+
+async def balancear(host, porta, portas_trabalhadores):
+    proxima_porta = itertools.cycle(portas_trabalhadores)
+
+    async def atender(cliente_leitor, cliente_escritor):
+        try:
+            servidor_leitor, servidor_escritor = await asyncio.open_connection("127.0.0.1", next(proxima_porta))
+        except OSError:
+            cliente_escritor.close()
+            return
+        await asyncio.gather(
+            encaminhar(cliente_leitor, servidor_escritor),
+            encaminhar(servidor_leitor, cliente_escritor),
+        )
+
+    servidor = await asyncio.start_server(atender, host, porta)
+    async with servidor:
+        await servidor.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa o app do SISAP em vários processos com a base em memória compartilhada.")
+    parser.add_argument("--trabalhadores", type=int, default=os.cpu_count() or 1, help="Quantidade de processos do app (padrão: núcleos da máquina)")
+    parser.add_argument("--host", default="0.0.0.0", help="Endereço de escuta do balanceador (padrão: 0.0.0.0)")
+    parser.add_argument("--porta", type=int, default=8501, help="Porta de acesso dos usuários (padrão: 8501)")
+    parser.add_argument("--porta-trabalhadores", type=int, default=8511, help="Primeira porta interna dos processos do app (padrão: 8511)")
+    args = parser.parse_args()
+
+    print("Preparando a base em memória compartilhada...")
+    arquivo_compartilhado = gerar_arquivo_compartilhado()
+    print(f"Base disponível em {arquivo_compartilhado}")
+
+    portas = [args.porta_trabalhadores + i for i in range(args.trabalhadores)]
+    # SIGTERM também encerra os processos do app e remove o arquivo da memória compartilhada
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    processos = iniciar_trabalhadores(arquivo_compartilhado, portas)
+    print(f"{len(processos)} processos do app nas portas {', '.join(map(str, portas))}; acesso em http://{args.host}:{args.porta}")
+    try:
+        asyncio.run(balancear(args.host, args.porta, portas))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.wait()
+        os.remove(arquivo_compartilhado)